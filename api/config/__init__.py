@@ -3,6 +3,8 @@ Configuration Package
 Centralized configuration management with service integration
 """
 
+import importlib
+
 from .manager import (
     ConfigurationManager,
     get_config_manager,
@@ -25,55 +27,74 @@ from .manager import (
     BusinessConfig
 )
 
-from .decorators import (
-    config_value,
-    config_section,
-    validate_config,
-    config_dependent,
-    environment_specific,
-    config_cache,
-    config_logger,
-    config_metrics,
-    ConfigProperty,
-    ConfigSection,
-    ConfigMixin,
-    fastapi_config_dependency,
-    fastapi_config_section_dependency,
-    validate_database_config,
-    validate_storage_config,
-    validate_security_config,
-    auto_reload_config,
-    config_change_listener
-)
+# Decorators and logging helpers are imported on first access (PEP 562) so
+# importing the package does not build the decorator suite or touch the
+# filesystem for log handlers until they are actually needed
+_LAZY_ATTRIBUTES = {
+    **dict.fromkeys((
+        "config_value",
+        "config_section",
+        "validate_config",
+        "config_dependent",
+        "environment_specific",
+        "config_cache",
+        "config_logger",
+        "config_metrics",
+        "ConfigProperty",
+        "ConfigSection",
+        "ConfigMixin",
+        "fastapi_config_dependency",
+        "fastapi_config_section_dependency",
+        "validate_database_config",
+        "validate_storage_config",
+        "validate_security_config",
+        "auto_reload_config",
+        "config_change_listener",
+    ), ".decorators"),
+    **dict.fromkeys((
+        "setup_logger",
+        "get_logger",
+        "get_service_logger",
+        "get_middleware_logger",
+        "get_api_logger",
+        "get_router_logger",
+        "MiddlewareLogger",
+        "get_auth_logger",
+        "get_storage_logger",
+        "get_prompt_logger",
+        "get_job_logger",
+        "get_project_logger",
+        "get_track_logger",
+        "get_video_logger",
+        "get_image_logger",
+        "get_audio_logger",
+        "get_export_logger",
+        "get_stats_logger",
+        "get_pricing_logger",
+        "cleanup_old_logs",
+        "app_logger",
+        # Global logger instances
+        "auth_middleware_logger",
+        "rate_limiting_logger",
+        "monitoring_logger",
+        "security_logger",
+    ), ".logging"),
+}
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
 
-from .logging import (
-    setup_logger,
-    get_logger,
-    get_service_logger,
-    get_middleware_logger,
-    get_api_logger,
-    get_router_logger,
-    MiddlewareLogger,
-    get_auth_logger,
-    get_storage_logger,
-    get_prompt_logger,
-    get_job_logger,
-    get_project_logger,
-    get_track_logger,
-    get_video_logger,
-    get_image_logger,
-    get_audio_logger,
-    get_export_logger,
-    get_stats_logger,
-    get_pricing_logger,
-    cleanup_old_logs,
-    app_logger,
-    # Global logger instances
-    auth_middleware_logger,
-    rate_limiting_logger,
-    monitoring_logger,
-    security_logger
-)
 
 # Global configuration manager instance
 config_manager = get_config_manager()
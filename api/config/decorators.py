@@ -5,6 +5,8 @@ Provides decorators for easy configuration access and validation
 
 import functools
 import logging
+import time
+from collections import OrderedDict
 from typing import Any, Callable, Dict, List, Optional, Type, TypeVar, Union
 
 from .manager import get_config_manager, get_config_value, set_config_value
@@ -14,6 +16,30 @@ logger = logging.getLogger(__name__)
 T = TypeVar('T')
 
 
+def _epoch_cached(resolve: Callable[[Any], Any]) -> Callable[[], Any]:
+    """
+    Memoize a configuration lookup until the configuration changes
+    
+    Args:
+        resolve: Callable receiving the configuration manager and returning the value
+    
+    Returns:
+        Zero-argument callable that only calls ``resolve`` again after the
+        manager is replaced or its ``_config_epoch`` is bumped
+    """
+    cached = (None, -1, None)  # (manager, epoch, value)
+    
+    def lookup():
+        nonlocal cached
+        manager = get_config_manager()
+        if cached[0] is not manager or cached[1] != manager._config_epoch:
+            epoch = manager._config_epoch
+            cached = (manager, epoch, resolve(manager))
+        return cached[2]
+    
+    return lookup
+
+
 def config_value(config_path: str, default: Any = None):
     """
     Decorator to inject configuration value into function parameter
@@ -22,15 +48,15 @@ def config_value(config_path: str, default: Any = None):
         config_path: Configuration path using dot notation (e.g., 'database.url')
         default: Default value if configuration is not found
     """
+    kwarg_name = f'config_{config_path.replace(".", "_")}'
+    path_parts = tuple(config_path.split("."))
+    
     def decorator(func: Callable) -> Callable:
+        lookup = _epoch_cached(lambda manager: manager.get_value(path_parts, default))
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            # Get configuration value
-            value = get_config_value(config_path, default)
-            
-            # Add to kwargs
-            kwargs[f'config_{config_path.replace(".", "_")}'] = value
-            
+            kwargs[kwarg_name] = lookup()
             return func(*args, **kwargs)
         
         return wrapper
@@ -45,15 +71,14 @@ def config_section(config_type: str):
     Args:
         config_type: Configuration section type (e.g., 'database', 'storage')
     """
+    kwarg_name = f'config_{config_type}'
+    
     def decorator(func: Callable) -> Callable:
+        lookup = _epoch_cached(lambda manager: manager.get_config(config_type))
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            # Get configuration section
-            config_section = get_config_manager().get_config(config_type)
-            
-            # Add to kwargs
-            kwargs[f'config_{config_type}'] = config_section
-            
+            kwargs[kwarg_name] = lookup()
             return func(*args, **kwargs)
         
         return wrapper
@@ -63,17 +88,27 @@ def config_section(config_type: str):
 
 def validate_config(func: Callable) -> Callable:
     """Decorator to validate configuration before function execution"""
+    last_issues: List[str] = []
     
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        # Validate configuration
-        issues = get_config_manager().validate_configuration()
+    def run_validation(manager) -> List[str]:
+        nonlocal last_issues
+        issues = manager.validate_configuration()
         
-        if issues:
-            logger.warning(f"Configuration validation issues: {issues}")
+        # Only report when the outcome changes, not on every revalidation
+        if issues and issues != last_issues:
+            logger.warning("Configuration validation issues: %s", issues)
             # You can choose to raise an exception or continue with warnings
             # raise ValueError(f"Configuration validation failed: {issues}")
         
+        last_issues = issues
+        return issues
+    
+    # Validation runs at most once per configuration epoch
+    validate = _epoch_cached(run_validation)
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        validate()
         return func(*args, **kwargs)
     
     return wrapper
@@ -87,16 +122,18 @@ def config_dependent(config_paths: List[str], required: bool = True):
         config_paths: List of configuration paths that must be available
         required: Whether to raise exception if config is missing
     """
+    config_paths = tuple(config_paths)
+    split_paths = tuple((path, tuple(path.split("."))) for path in config_paths)
+    
     def decorator(func: Callable) -> Callable:
+        find_missing = _epoch_cached(
+            lambda manager: [path for path, parts in split_paths if manager.get_value(parts) is None]
+        )
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             # Check configuration dependencies
-            missing_configs = []
-            
-            for config_path in config_paths:
-                value = get_config_value(config_path)
-                if value is None:
-                    missing_configs.append(config_path)
+            missing_configs = find_missing()
             
             if missing_configs:
                 error_msg = f"Missing required configuration: {missing_configs}"
@@ -119,12 +156,16 @@ def environment_specific(environments: List[str]):
     Args:
         environments: List of allowed environments
     """
+    allowed_environments = frozenset(environments)
+    
     def decorator(func: Callable) -> Callable:
+        # The environment is fixed between reloads, so the gate is one cached flag
+        is_allowed = _epoch_cached(lambda manager: manager.environment.value in allowed_environments)
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            current_env = get_config_manager().environment.value
-            
-            if current_env not in environments:
+            if not is_allowed():
+                current_env = get_config_manager().environment.value
                 raise RuntimeError(f"Function {func.__name__} is not allowed in environment: {current_env}")
             
             return func(*args, **kwargs)
@@ -134,33 +175,60 @@ def environment_specific(environments: List[str]):
     return decorator
 
 
-def config_cache(cache_key: str, ttl: int = 300):
+def config_cache(cache_key: str, ttl: int = 300, maxsize: int = 1024):
     """
     Decorator to cache configuration-dependent function results
     
+    Results are cached per distinct set of call arguments, evicted in LRU
+    order once ``maxsize`` entries are stored, and expire after ``ttl``.
+    
     Args:
-        cache_key: Cache key for the result
+        cache_key: Cache key prefix for the results
         ttl: Time to live in seconds
+        maxsize: Maximum number of cached argument sets
     """
     def decorator(func: Callable) -> Callable:
-        cache = {}
+        cache: "OrderedDict[Any, Any]" = OrderedDict()
+        clock = time.monotonic
+        
+        def prune_expired(now: float):
+            expired = [key for key, (_, expires_at) in cache.items() if expires_at <= now]
+            for key in expired:
+                cache.pop(key, None)
         
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            import time
+            key = (cache_key, args, tuple(sorted(kwargs.items()))) if kwargs else (cache_key, args)
+            try:
+                entry = cache.get(key)
+            except TypeError:
+                # Unhashable arguments cannot be cached
+                return func(*args, **kwargs)
             
             # Check cache
-            if cache_key in cache:
-                cached_result, timestamp = cache[cache_key]
-                if time.time() - timestamp < ttl:
+            now = clock()
+            if entry is not None:
+                cached_result, expires_at = entry
+                if now < expires_at:
+                    try:
+                        cache.move_to_end(key)
+                    except KeyError:
+                        pass  # Evicted concurrently
                     return cached_result
+                cache.pop(key, None)
             
             # Execute function and cache result
             result = func(*args, **kwargs)
-            cache[cache_key] = (result, time.time())
+            
+            if len(cache) >= maxsize:
+                prune_expired(now)
+                while len(cache) >= maxsize:
+                    cache.popitem(last=False)
+            cache[key] = (result, now + ttl)
             
             return result
         
+        wrapper.cache_clear = cache.clear
         return wrapper
     
     return decorator
@@ -170,15 +238,11 @@ def config_logger(logger_name: Optional[str] = None):
     """Decorator to inject configuration-aware logger"""
     
     def decorator(func: Callable) -> Callable:
+        # Loggers are process-wide singletons, so resolve once at decoration time
+        logger_instance = logging.getLogger(logger_name or func.__module__)
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            # Get logger
-            if logger_name:
-                logger_instance = logging.getLogger(logger_name)
-            else:
-                logger_instance = logging.getLogger(func.__module__)
-            
-            # Add logger to kwargs
             kwargs['logger'] = logger_instance
             
             return func(*args, **kwargs)
@@ -192,25 +256,25 @@ def config_metrics(metric_name: str):
     """Decorator to add configuration-aware metrics"""
     
     def decorator(func: Callable) -> Callable:
+        perf_counter = time.perf_counter
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            import time
-            
-            start_time = time.time()
+            start_time = perf_counter()
             
             try:
                 result = func(*args, **kwargs)
                 
                 # Log success metric
-                duration = time.time() - start_time
-                logger.info(f"Metric {metric_name}: success, duration={duration:.3f}s")
+                duration = perf_counter() - start_time
+                logger.info("Metric %s: success, duration=%.3fs", metric_name, duration)
                 
                 return result
                 
             except Exception as e:
                 # Log error metric
-                duration = time.time() - start_time
-                logger.error(f"Metric {metric_name}: error, duration={duration:.3f}s, error={str(e)}")
+                duration = perf_counter() - start_time
+                logger.error("Metric %s: error, duration=%.3fs, error=%s", metric_name, duration, e)
                 raise
         
         return wrapper
@@ -221,12 +285,15 @@ def config_metrics(metric_name: str):
 class ConfigProperty:
     """Property-like access to configuration values"""
     
+    __slots__ = ("config_path", "parts", "default")
+    
     def __init__(self, config_path: str, default: Any = None):
         self.config_path = config_path
+        self.parts = tuple(config_path.split("."))
         self.default = default
     
     def __get__(self, instance, owner):
-        return get_config_value(self.config_path, self.default)
+        return get_config_value(self.parts, self.default)
     
     def __set__(self, instance, value):
         set_config_value(self.config_path, value)
@@ -235,6 +302,8 @@ class ConfigProperty:
 class ConfigSection:
     """Section-like access to configuration"""
     
+    __slots__ = ("config_type",)
+    
     def __init__(self, config_type: str):
         self.config_type = config_type
     
@@ -246,30 +315,30 @@ class ConfigSection:
 class ConfigMixin:
     """Mixin class to provide configuration access to classes"""
     
-    @property
+    @functools.cached_property
     def config(self):
-        """Get configuration manager"""
+        """Get configuration manager (resolved once per instance)"""
         return get_config_manager()
     
     def get_config_value(self, config_path: str, default: Any = None) -> Any:
         """Get configuration value"""
-        return get_config_value(config_path, default)
+        return self.config.get_value(config_path, default)
     
     def set_config_value(self, config_path: str, value: Any):
         """Set configuration value"""
-        set_config_value(config_path, value)
+        self.config.set_value(config_path, value)
     
     def get_config_section(self, config_type: str) -> Any:
         """Get configuration section"""
-        return get_config_manager().get_config(config_type)
+        return self.config.get_config(config_type)
 
 
 # FastAPI integration decorators
 def fastapi_config_dependency(config_path: str, default: Any = None):
     """Create FastAPI dependency for configuration value"""
     
-    def dependency():
-        return get_config_value(config_path, default)
+    path_parts = tuple(config_path.split("."))
+    dependency = _epoch_cached(lambda manager: manager.get_value(path_parts, default))
     
     # Add metadata for FastAPI
     dependency._config_path = config_path
@@ -282,8 +351,7 @@ def fastapi_config_dependency(config_path: str, default: Any = None):
 def fastapi_config_section_dependency(config_type: str):
     """Create FastAPI dependency for configuration section"""
     
-    def dependency():
-        return get_config_manager().get_config(config_type)
+    dependency = _epoch_cached(lambda manager: manager.get_config(config_type))
     
     # Add metadata for FastAPI
     dependency._config_type = config_type
@@ -293,58 +361,73 @@ def fastapi_config_section_dependency(config_type: str):
 
 
 # Configuration validation decorators
-def validate_database_config(func: Callable) -> Callable:
-    """Validate database configuration before function execution"""
+def _epoch_validated(check: Callable[[Any], Optional[str]], func: Callable) -> Callable:
+    """
+    Wrap ``func`` so it raises ValueError while ``check`` reports a problem
+    
+    The check itself only runs again after the configuration epoch changes.
+    """
+    find_error = _epoch_cached(check)
     
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        db_config = get_config_manager().get_config("database")
-        
-        if not db_config.url:
-            raise ValueError("Database URL is required")
-        
-        if db_config.pool_size <= 0:
-            raise ValueError("Database pool size must be positive")
-        
+        error = find_error()
+        if error:
+            raise ValueError(error)
         return func(*args, **kwargs)
     
     return wrapper
 
 
-def validate_storage_config(func: Callable) -> Callable:
-    """Validate storage configuration before function execution"""
+def _check_database_config(manager) -> Optional[str]:
+    db_config = manager.get_config("database")
     
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        storage_config = get_config_manager().get_config("storage")
-        
-        if not storage_config.s3_bucket:
-            raise ValueError("S3 bucket is required")
-        
-        if not storage_config.s3_access_key:
-            raise ValueError("S3 access key is required")
-        
-        return func(*args, **kwargs)
+    if not db_config.url:
+        return "Database URL is required"
     
-    return wrapper
+    if db_config.pool_size <= 0:
+        return "Database pool size must be positive"
+    
+    return None
 
 
-def validate_security_config(func: Callable) -> Callable:
-    """Validate security configuration before function execution"""
+def _check_storage_config(manager) -> Optional[str]:
+    storage_config = manager.get_config("storage")
     
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        security_config = get_config_manager().get_config("security")
-        
-        if not security_config.secret_key:
-            raise ValueError("Secret key is required")
-        
-        if security_config.secret_key == "your-secret-key-here-change-in-production":
-            raise ValueError("Default secret key detected - change in production")
-        
-        return func(*args, **kwargs)
+    if not storage_config.s3_bucket:
+        return "S3 bucket is required"
     
-    return wrapper
+    if not storage_config.s3_access_key:
+        return "S3 access key is required"
+    
+    return None
+
+
+def _check_security_config(manager) -> Optional[str]:
+    security_config = manager.get_config("security")
+    
+    if not security_config.secret_key:
+        return "Secret key is required"
+    
+    if security_config.secret_key == "your-secret-key-here-change-in-production":
+        return "Default secret key detected - change in production"
+    
+    return None
+
+
+def validate_database_config(func: Callable) -> Callable:
+    """Validate database configuration before function execution"""
+    return _epoch_validated(_check_database_config, func)
+
+
+def validate_storage_config(func: Callable) -> Callable:
+    """Validate storage configuration before function execution"""
+    return _epoch_validated(_check_storage_config, func)
+
+
+def validate_security_config(func: Callable) -> Callable:
+    """Validate security configuration before function execution"""
+    return _epoch_validated(_check_security_config, func)
 
 
 # Configuration reload decorators
@@ -3,23 +3,19 @@ Centralized logging configuration for clipizy Backend
 Single source of truth for all logging across the application
 """
 
+import atexit
 import logging
 import logging.handlers
+import os
+import queue
+import re
 import sys
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Dict, Any
-from datetime import datetime
+from typing import Optional, Dict, Any, List
 
-# Import configuration manager for dynamic logging settings
-try:
-    from .manager import get_config_manager
-    _config_manager = get_config_manager()
-except ImportError:
-    _config_manager = None
-
-# Create logs directory
+# Logs directory (created when the first file handler is opened)
 LOGS_DIR = Path(__file__).parent.parent.parent / "logs"
-LOGS_DIR.mkdir(exist_ok=True)
 
 # Log file paths
 INFO_LOG = LOGS_DIR / "info.log"
@@ -29,28 +25,209 @@ SERVICE_LOG = LOGS_DIR / "services.log"
 MIDDLEWARE_LOG = LOGS_DIR / "middleware.log"
 API_LOG = LOGS_DIR / "api.log"
 
+# Formatters are shared by every handler instead of being rebuilt per logger
+_DETAILED_FORMATTER = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s", 
+    datefmt="%Y-%m-%d %H:%M:%S"
+)
+
+_SIMPLE_FORMATTER = logging.Formatter(
+    "%(asctime)s - %(levelname)s - %(message)s", 
+    datefmt="%H:%M:%S"
+)
+
+
+# Default configuration used until the configuration manager is available
+DEFAULT_LOGGING_CONFIG: Dict[str, Any] = {
+    "level": "INFO",
+    "file_max_size": 10 * 1024 * 1024,  # 10MB
+    "file_backup_count": 5,
+    "enable_console": True,
+    "enable_file": True,
+    "log_format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+}
+
+# (manager, config epoch, logging config) of the last resolution
+_logging_config_cache: tuple = (None, -1, None)
+_resolving_config_manager = False
+
+
+def _resolve_config_manager():
+    """
+    Resolve the configuration manager lazily
+    
+    Returns None while the manager cannot be imported yet (e.g. during an
+    import cycle) or while it is being constructed, so that loggers created
+    in the meantime fall back to the default configuration.
+    """
+    global _resolving_config_manager
+    if _resolving_config_manager:
+        return None
+    
+    _resolving_config_manager = True
+    try:
+        from .manager import get_config_manager
+        return get_config_manager()
+    except ImportError:
+        return None
+    finally:
+        _resolving_config_manager = False
+
 
 def get_logging_config() -> Dict[str, Any]:
     """Get logging configuration from config manager"""
-    if _config_manager:
-        return {
-            "level": _config_manager.logging.level.value,
-            "file_max_size": _config_manager.logging.file_max_size,
-            "file_backup_count": _config_manager.logging.file_backup_count,
-            "enable_console": _config_manager.logging.enable_console_logging,
-            "enable_file": _config_manager.logging.enable_file_logging,
-            "log_format": _config_manager.logging.log_format
-        }
-    else:
-        # Default configuration
-        return {
-            "level": "INFO",
-            "file_max_size": 10 * 1024 * 1024,  # 10MB
-            "file_backup_count": 5,
-            "enable_console": True,
-            "enable_file": True,
-            "log_format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        }
+    global _logging_config_cache
+    config_manager = _resolve_config_manager()
+    if config_manager is None:
+        return DEFAULT_LOGGING_CONFIG
+    
+    # Rebuild only after the configuration has been reloaded or changed
+    cached_manager, cached_epoch, cached_config = _logging_config_cache
+    epoch = config_manager._config_epoch
+    if cached_manager is config_manager and cached_epoch == epoch:
+        return cached_config
+    
+    logging_config = config_manager.logging
+    config = {
+        "level": logging_config.level.value,
+        "file_max_size": logging_config.file_max_size,
+        "file_backup_count": logging_config.file_backup_count,
+        "enable_console": logging_config.enable_console_logging,
+        "enable_file": logging_config.enable_file_logging,
+        "log_format": logging_config.log_format
+    }
+    _logging_config_cache = (config_manager, epoch, config)
+    return config
+
+
+# Log records are queued by the calling thread and written by a background
+# listener, so request handlers never block on file I/O or handler locks
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_queue_listener: Optional[logging.handlers.QueueListener] = None
+
+# Real (console/file) handlers behind the queue, keyed by logger name
+_sink_handlers: Dict[str, List[logging.Handler]] = {}
+
+
+class _SinkQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that tags records with the logger whose handlers should emit them"""
+    
+    def __init__(self, sink_name: str):
+        super().__init__(_log_queue)
+        self.sink_name = sink_name
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # prepare() returns a copy, so tagging it does not leak to other handlers
+        record = super().prepare(record)
+        record.clipizy_sink = self.sink_name
+        return record
+
+
+class _SinkDispatchHandler(logging.Handler):
+    """Listener-side handler routing queued records to their logger's real handlers"""
+    
+    def handle(self, record: logging.LogRecord) -> bool:
+        for handler in _sink_handlers.get(record.clipizy_sink, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+
+def _start_queue_listener():
+    """Start the background log listener on first use"""
+    global _queue_listener
+    if _queue_listener is None:
+        _queue_listener = logging.handlers.QueueListener(_log_queue, _SinkDispatchHandler())
+        _queue_listener.start()
+        atexit.register(_stop_queue_listener)
+
+
+def _stop_queue_listener():
+    """Flush queued records and stop the background log listener"""
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+def _attach_handler(logger: logging.Logger, handler: logging.Handler):
+    """Attach a handler to a logger behind the shared log queue"""
+    sinks = _sink_handlers.get(logger.name)
+    if sinks is None:
+        sinks = _sink_handlers[logger.name] = []
+        logger.addHandler(_SinkQueueHandler(logger.name))
+        _start_queue_listener()
+    sinks.append(handler)
+
+
+@lru_cache(maxsize=None)
+def _route_log_file(name: str) -> Path:
+    """
+    Pick the log file for a logger from its name
+    
+    Substring rules, checked in order: "middleware" goes to the middleware
+    log, "api" or "router" to the API log, "service" to the services log,
+    anything else to the info log. So every ``api.*`` logger (including
+    ``api.services.*``) writes to api.log, and ``auth_service`` to
+    services.log. Resolved once per logger name.
+    """
+    lowered = name.lower()
+    if "middleware" in lowered:
+        return MIDDLEWARE_LOG
+    if "api" in lowered or "router" in lowered:
+        return API_LOG
+    if "service" in lowered:
+        return SERVICE_LOG
+    return INFO_LOG
+
+
+# Rotating file handlers shared by every logger writing to the same file
+_file_handlers: Dict[Path, logging.Handler] = {}
+
+# Single error.log handler shared by every configured logger
+_error_handler: Optional[logging.Handler] = None
+
+
+def _get_file_handler(target_log: Path, config: Dict[str, Any]) -> logging.Handler:
+    """
+    Get the shared rotating handler for a log file, creating it on first use
+    
+    Loggers writing to the same file share one handler (one descriptor, one
+    lock, one rotation point). Per-logger levels are enforced by the loggers.
+    """
+    handler = _file_handlers.get(target_log)
+    if handler is None:
+        Path(target_log).parent.mkdir(exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            target_log, 
+            maxBytes=config["file_max_size"], 
+            backupCount=config["file_backup_count"], 
+            encoding="utf-8"
+        )
+        handler.setFormatter(_DETAILED_FORMATTER)
+        _file_handlers[target_log] = handler
+    return handler
+
+
+def _get_error_handler(config: Dict[str, Any]) -> logging.Handler:
+    """
+    Get the shared error file handler, creating it on first use
+    
+    Sharing one handler keeps a single file descriptor and lock on ERROR_LOG
+    no matter how many loggers are configured.
+    """
+    global _error_handler
+    if _error_handler is None:
+        LOGS_DIR.mkdir(exist_ok=True)
+        _error_handler = logging.handlers.RotatingFileHandler(
+            ERROR_LOG, 
+            maxBytes=config["file_max_size"], 
+            backupCount=config["file_backup_count"], 
+            encoding="utf-8"
+        )
+        _error_handler.setLevel(logging.ERROR)
+        _error_handler.setFormatter(_DETAILED_FORMATTER)
+    return _error_handler
 
 
 def setup_logger(name: str, level: Optional[str] = None, log_file: Optional[Path] = None) -> logging.Logger:
@@ -73,63 +250,30 @@ def setup_logger(name: str, level: Optional[str] = None, log_file: Optional[Path
     logger.setLevel(log_level)
 
     # Prevent duplicate handlers
-    if logger.handlers:
+    if getattr(logger, "_clipizy_configured", False):
         return logger
-
-    # Create formatters
-    detailed_formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s", 
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
-
-    simple_formatter = logging.Formatter(
-        "%(asctime)s - %(levelname)s - %(message)s", 
-        datefmt="%H:%M:%S"
-    )
+    logger._clipizy_configured = True
 
     # Console handler
     if config["enable_console"]:
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setLevel(logging.INFO)
-        console_handler.setFormatter(simple_formatter)
-        logger.addHandler(console_handler)
+        console_handler.setFormatter(_SIMPLE_FORMATTER)
+        _attach_handler(logger, console_handler)
 
     # File handlers
     if config["enable_file"]:
         # Determine log file based on logger name or provided file
-        if log_file:
-            target_log = log_file
-        elif "middleware" in name.lower():
-            target_log = MIDDLEWARE_LOG
-        elif "api" in name.lower() or "router" in name.lower():
-            target_log = API_LOG
-        elif "service" in name.lower():
-            target_log = SERVICE_LOG
-        else:
-            target_log = INFO_LOG
-
-        # File handler (rotating)
-        file_handler = logging.handlers.RotatingFileHandler(
-            target_log, 
-            maxBytes=config["file_max_size"], 
-            backupCount=config["file_backup_count"], 
-            encoding="utf-8"
-        )
-        file_handler.setLevel(log_level)
-        file_handler.setFormatter(detailed_formatter)
-        logger.addHandler(file_handler)
+        target_log = log_file or _route_log_file(name)
+
+        # File handler (rotating, shared per file)
+        _attach_handler(logger, _get_file_handler(target_log, config))
+        if target_log == SERVICE_LOG:
+            logger._clipizy_service_handler = True
 
         # Error file handler for all loggers
         if target_log != ERROR_LOG:
-            error_handler = logging.handlers.RotatingFileHandler(
-                ERROR_LOG, 
-                maxBytes=config["file_max_size"], 
-                backupCount=config["file_backup_count"], 
-                encoding="utf-8"
-            )
-            error_handler.setLevel(logging.ERROR)
-            error_handler.setFormatter(detailed_formatter)
-            logger.addHandler(error_handler)
+            _attach_handler(logger, _get_error_handler(config))
 
     return logger
 
@@ -161,23 +305,9 @@ def get_service_logger(service_name: str) -> logging.Logger:
     logger = setup_logger(f"services.{service_name}")
 
     # Add service-specific file handler if it doesn't exist
-    service_handler_exists = any(
-        isinstance(handler, logging.handlers.RotatingFileHandler) and handler.baseFilename == str(SERVICE_LOG)
-        for handler in logger.handlers
-    )
-
-    if not service_handler_exists:
-        service_handler = logging.handlers.RotatingFileHandler(
-            SERVICE_LOG, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8"
-        )
-        service_handler.setLevel(logging.INFO)
-        service_handler.setFormatter(
-            logging.Formatter(
-                "%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s",
-                datefmt="%Y-%m-%d %H:%M:%S",
-            )
-        )
-        logger.addHandler(service_handler)
+    if not getattr(logger, "_clipizy_service_handler", False):
+        logger._clipizy_service_handler = True
+        _attach_handler(logger, _get_file_handler(SERVICE_LOG, DEFAULT_LOGGING_CONFIG))
 
     return logger
 
@@ -226,32 +356,50 @@ def get_router_logger(router_name: str) -> logging.Logger:
     return get_api_logger(f"router.{router_name}")
 
 
+# Level names accepted by MiddlewareLogger.log_request
+_LOG_LEVELS: Dict[str, int] = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "warn": logging.WARNING,
+    "error": logging.ERROR,
+    "critical": logging.CRITICAL,
+}
+
+
 # Structured logging for middleware
 class MiddlewareLogger:
     """Structured logger for middleware components"""
     
+    __slots__ = ("logger", "middleware_name")
+    
     def __init__(self, middleware_name: str):
         self.logger = get_middleware_logger(middleware_name)
         self.middleware_name = middleware_name
     
     def log_request(self, request, message: str, level: str = "info", **kwargs):
         """Log request with structured data"""
+        levelno = _LOG_LEVELS.get(level.lower(), logging.INFO)
+        if not self.logger.isEnabledFor(levelno):
+            return
+        
+        if not kwargs:
+            self.logger.log(levelno, "[%s] %s", self.middleware_name, message)
+            return
+        
+        # Records are timestamped by the formatter, so no timestamp field here
+        client = request.client
         log_data = {
             "middleware": self.middleware_name,
             "method": request.method,
             "path": request.url.path,
-            "client_ip": request.client.host if request.client else "unknown",
+            "client_ip": client.host if client else "unknown",
             "user_agent": request.headers.get("user-agent", "unknown"),
-            "timestamp": datetime.utcnow().isoformat(),
             **kwargs
         }
         
-        log_message = f"[{self.middleware_name}] {message}"
-        if kwargs:
-            log_message += f" | Data: {log_data}"
-        
-        log_method = getattr(self.logger, level.lower())
-        log_method(log_message)
+        # The dict is only stringified if a handler actually emits the record
+        self.logger.log(levelno, "[%s] %s | Data: %s", self.middleware_name, message, log_data)
     
     def log_error(self, request, error: Exception, **kwargs):
         """Log error with structured data"""
@@ -268,11 +416,40 @@ class MiddlewareLogger:
         self.logger.info(f"[{self.middleware_name}] Stats: {stats}")
 
 
+class _LazyLogger:
+    """
+    Module-level logger placeholder that configures the real logger on first use
+    
+    Keeps importing this module free of handler setup and filesystem work. Once
+    resolved, the module global is rebound to the real logger.
+    """
+    
+    __slots__ = ("_global_name", "_factory", "_logger")
+    
+    def __init__(self, global_name: str, factory):
+        self._global_name = global_name
+        self._factory = factory
+        self._logger = None
+    
+    def _resolve(self) -> logging.Logger:
+        logger = self._logger
+        if logger is None:
+            logger = self._logger = self._factory()
+            globals()[self._global_name] = logger
+        return logger
+    
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._resolve(), attr)
+    
+    def __repr__(self) -> str:
+        return f"<_LazyLogger {self._global_name}>"
+
+
 # Global logger instances for common use cases
-auth_middleware_logger = get_middleware_logger("auth_middleware")
-rate_limiting_logger = get_middleware_logger("rate_limiting")
-monitoring_logger = get_middleware_logger("monitoring")
-security_logger = get_middleware_logger("security")
+auth_middleware_logger = _LazyLogger("auth_middleware_logger", lambda: get_middleware_logger("auth_middleware"))
+rate_limiting_logger = _LazyLogger("rate_limiting_logger", lambda: get_middleware_logger("rate_limiting"))
+monitoring_logger = _LazyLogger("monitoring_logger", lambda: get_middleware_logger("monitoring"))
+security_logger = _LazyLogger("security_logger", lambda: get_middleware_logger("security"))
 
 
 def get_storage_logger():
@@ -319,6 +496,10 @@ def get_pricing_logger():
     return get_service_logger("pricing_service")
 
 
+# Matches active log files and their rotated backups (e.g. info.log, info.log.3)
+_LOG_FILE_PATTERN = re.compile(r"\.log(\.\d+)?$")
+
+
 # Log cleanup function
 def cleanup_old_logs(days_to_keep: int = 30):
     """
@@ -332,11 +513,18 @@ def cleanup_old_logs(days_to_keep: int = 30):
     current_time = time.time()
     cutoff_time = current_time - (days_to_keep * 24 * 60 * 60)
 
-    for log_file in LOGS_DIR.glob("*.log*"):
-        if log_file.stat().st_mtime < cutoff_time:
-            log_file.unlink()
-            print(f"Deleted old log file: {log_file}")
+    if not LOGS_DIR.is_dir():
+        return
+
+    # DirEntry.stat() reuses data from the directory scan where the OS provides it
+    with os.scandir(LOGS_DIR) as entries:
+        for entry in entries:
+            if not _LOG_FILE_PATTERN.search(entry.name) or not entry.is_file():
+                continue
+            if entry.stat().st_mtime < cutoff_time:
+                os.unlink(entry.path)
+                app_logger.info("Deleted old log file: %s", entry.path)
 
 
-# Initialize main application logger
-app_logger = setup_logger("clipizy_app")
+# Main application logger (configured on first use)
+app_logger = _LazyLogger("app_logger", lambda: setup_logger("clipizy_app"))
@@ -9,19 +9,22 @@ import os
 import traceback
 from contextlib import asynccontextmanager
 
+import orjson
 import uvicorn
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, HTTPException
 from typing import Dict, Any
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from starlette.middleware.base import BaseHTTPMiddleware
 
 # Load environment variables from .env file
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
 
 from api.config.settings import settings
+from api.config.manager import get_config_manager
+from api.config.logging import get_api_logger
 
 # Import middleware
 from api.middleware.sanitizer_middleware import SanitizerMiddleware, SanitizationConfig, SanitizationLevel
@@ -30,7 +33,7 @@ from api.middleware.rate_limiting_middleware import RateLimitingMiddleware, Rate
 from api.middleware.security_headers_middleware import SecurityHeadersMiddleware, SecurityHeadersConfig
 from api.middleware.monitoring_middleware import MonitoringMiddleware, MonitoringConfig
 from api.middleware.auth_middleware import AuthMiddleware, AuthMiddlewareConfig
-from api.middleware.localhost_logging_middleware import LocalhostLoggingMiddleware
+from api.middleware.localhost_logging_middleware import install_localhost_log_filter
 
 # Import router architecture
 from api.routers import (
@@ -65,51 +68,31 @@ from api.routers.health_router import router as health_router
 # Import services for initialization
 # from api.services.sanitization import SanitizerConfig as MediaSanitizerConfig  # Module not found
 
-
-class LargeBodyMiddleware(BaseHTTPMiddleware):
-    """Middleware to handle large request bodies"""
-
-    def __init__(self, app, max_body_size: int = 100 * 1024 * 1024):  # 100MB default
-        super().__init__(app)
-        self.max_body_size = max_body_size
-
-    async def dispatch(self, request: Request, call_next):
-        # Check content length if available
-        content_length = request.headers.get("content-length")
-        if content_length and int(content_length) > self.max_body_size:
-            return JSONResponse(status_code=413, content={"error": "Payload Too Large", "max_size": self.max_body_size})
-
-        # Read the body to prevent uvicorn's default 1MB limit
-        try:
-            body = await request.body()
-            if len(body) > self.max_body_size:
-                return JSONResponse(
-                    status_code=413, content={"error": "Payload Too Large", "max_size": self.max_body_size}
-                )
-            # Store the body for later use
-            request._body = body
-        except Exception as e:
-            return JSONResponse(
-                status_code=500,
-                content={"error": "Internal server error", "detail": str(e)})
-
-        response = await call_next(request)
-        return response
+# Startup messages go through the queued API logger instead of print(), so
+# failures keep their tracebacks and writes never block on stdout
+logger = get_api_logger("main")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     # Startup
-    print("🚀 Starting SocialPartners API with sophisticated architecture...")
+    logger.info("🚀 Starting SocialPartners API with sophisticated architecture...")
+
+    # Initialize database tables (development only; other environments rely on migrations)
+    if os.getenv("ENVIRONMENT", "development") == "development":
+        try:
+            from api.services.database import create_tables
+            await asyncio.to_thread(create_tables)
+            logger.info("✅ Database tables created/verified")
+        except Exception:
+            logger.exception("⚠️ Database table creation failed")
 
-    # Initialize database tables
+    # Configuration overrides stored in the database (blocking query, off the loop)
     try:
-        from api.services.database import create_tables
-        create_tables()
-        print("✅ Database tables created/verified")
-    except Exception as e:
-        print(f"⚠️ Database table creation failed: {e}")
+        await asyncio.to_thread(get_config_manager().load_database_overrides)
+    except Exception:
+        logger.exception("⚠️ Loading database configuration overrides failed")
 
     # Queue manager removed
 
@@ -117,15 +100,15 @@ async def lifespan(app: FastAPI):
     try:
         issues = validate_router_registry()
         if issues:
-            print(f"⚠️ Router validation issues found: {issues}")
+            logger.warning("⚠️ Router validation issues found: %s", issues)
         else:
-            print("✅ Router architecture validation passed")
-    except Exception as e:
-        print(f"⚠️ Router validation failed: {e}")
+            logger.info("✅ Router architecture validation passed")
+    except Exception:
+        logger.exception("⚠️ Router validation failed")
 
     yield
     
-    print("🛑 Shutting down SocialPartners API...")
+    logger.info("🛑 Shutting down SocialPartners API...")
 
 
 def register_all_routers():
@@ -151,7 +134,7 @@ def register_all_routers():
     registry.register_router("admin_database_data", database_data_router)
     registry.register_router("workflows", workflows_router)
     
-    print("✅ All routers registered with registry")
+    logger.info("✅ All routers registered with registry")
 
 
 def validate_router_architecture():
@@ -159,30 +142,30 @@ def validate_router_architecture():
     try:
         issues = validate_router_registry()
         if issues:
-            print("⚠️ Router architecture validation issues:")
+            logger.warning("⚠️ Router architecture validation issues:")
             for router_name, router_issues in issues.items():
-                print(f"  - {router_name}: {router_issues}")
+                logger.warning("  - %s: %s", router_name, router_issues)
         else:
-            print("✅ Router architecture validation passed")
+            logger.info("✅ Router architecture validation passed")
         
-        # Print router summary
+        # Log router summary
         summary = get_router_registry_summary()
-        print(f"📊 Router Summary: {summary['total_registered']} routers registered")
-        print(f"📊 Categories: {summary['categories']}")
-        print(f"📊 Priorities: {summary['priorities']}")
+        logger.info("📊 Router Summary: %s routers registered", summary['total_registered'])
+        logger.info("📊 Categories: %s", summary['categories'])
+        logger.info("📊 Priorities: %s", summary['priorities'])
         
         return issues
     except Exception as e:
-        print(f"❌ Router validation failed: {e}")
+        logger.exception("❌ Router validation failed")
         return {"validation_error": [str(e)]}
 
 
 # Register all routers with the registry BEFORE app creation
 try:
     register_all_routers()
-    print("✅ All routers registered with sophisticated architecture")
-except Exception as e:
-    print(f"⚠️ Router registration failed: {e}")
+    logger.info("✅ All routers registered with sophisticated architecture")
+except Exception:
+    logger.exception("⚠️ Router registration failed")
 
 # Create FastAPI app with sophisticated configuration
 app = FastAPI(
@@ -192,11 +175,16 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/openapi.json",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
 # Middleware configuration - CORS + Auth for proper authentication
-print("✅ Using CORS + Auth middleware for proper authentication")
+logger.info("✅ Using CORS + Auth middleware for proper authentication")
+
+# Compress larger response bodies (JSON listings, validation error dumps);
+# small bodies are sent as-is since gzip would not pay for itself
+app.add_middleware(GZipMiddleware, minimum_size=1000)
 
 # CORS middleware - required for frontend communication
 app.add_middleware(
@@ -230,14 +218,30 @@ auth_config = AuthMiddlewareConfig(
 )
 app.add_middleware(AuthMiddleware, config=auth_config)
 
-app.add_middleware(LocalhostLoggingMiddleware)
+# Rewrite 127.0.0.1 as localhost in log output (installed once; not a middleware)
+install_localhost_log_filter()
 
 register_all_routers_with_app(app)
-print("✅ All routers included in FastAPI app")
+logger.info("✅ All routers included in FastAPI app")
+
+# (router summary, serialized root response) - rebuilt when the summary changes
+_root_response_cache = (None, b"")
+
 
 @app.get("/")
 async def root():
     """Root endpoint with sophisticated architecture information"""
+    global _root_response_cache
+    summary = get_router_registry_summary()
+    cached_summary, body = _root_response_cache
+    if cached_summary is not summary:
+        body = orjson.dumps(_build_root_info(summary))
+        _root_response_cache = (summary, body)
+    return Response(content=body, media_type="application/json")
+
+
+def _build_root_info(router_summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the root endpoint payload"""
     return {
         "message": "SocialPartners API - Sophisticated Architecture",
         "version": "2.0.0",
@@ -257,7 +261,7 @@ async def root():
             "health": "/health",
             "metrics": "/metrics"
         },
-        "router_summary": get_router_registry_summary()
+        "router_summary": router_summary
     }
 
 
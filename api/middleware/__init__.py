@@ -8,7 +8,8 @@ from .auth_middleware import (
     AuthMiddlewareConfig,
     get_user_from_request,
     get_user_id_from_request,
-    is_admin_from_request
+    is_admin_from_request,
+    invalidate_auth_cache
 )
 
 from .monitoring_middleware import (
@@ -31,6 +32,11 @@ from .security_headers_middleware import (
     SecurityHeadersConfig
 )
 
+from .body_size_middleware import (
+    LargeBodyMiddleware,
+    PayloadTooLarge
+)
+
 from .error_middleware import (
     GlobalErrorHandler
 )
@@ -50,6 +56,7 @@ __all__ = [
     "get_user_from_request",
     "get_user_id_from_request",
     "is_admin_from_request",
+    "invalidate_auth_cache",
     
     # Monitoring middleware
     "MonitoringMiddleware",
@@ -67,6 +74,10 @@ __all__ = [
     "SecurityHeadersMiddleware",
     "SecurityHeadersConfig",
     
+    # Body size middleware
+    "LargeBodyMiddleware",
+    "PayloadTooLarge",
+    
     # Error middleware
     "GlobalErrorHandler",
     
@@ -3,16 +3,22 @@
 AUTHENTICATION MIDDLEWARE
 FastAPI middleware for automatic authentication and user context
 """
-from typing import Optional, Dict, Any
-from dataclasses import dataclass
+from typing import Optional, Dict, Any, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import hashlib
+import logging
+import time
 
 from fastapi import Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+from starlette.responses import Response
+import orjson
 
 from api.services.auth import auth_service
-from api.services.database import get_db
+from api.services.auth.auth import detached_user_from_snapshot, user_column_snapshot
 from api.models import User
 from api.config.logging import MiddlewareLogger, get_middleware_logger
 from .utils import BaseMiddleware, MiddlewareConfig, get_user_identifier, get_client_ip
@@ -24,6 +30,90 @@ logger = get_middleware_logger("auth_middleware")
 
 security = HTTPBearer()
 
+# Fixed error bodies, serialized once instead of on every rejected request
+_ADMIN_REQUIRED_BODY = orjson.dumps({
+    "error": "Admin access required",
+    "detail": "This endpoint requires administrator privileges"
+})
+_AUTH_REQUIRED_BODY = orjson.dumps({
+    "error": "Authentication required",
+    "detail": "Valid authentication token required for this endpoint"
+})
+_AUTH_SERVICE_ERROR_BODY = orjson.dumps({
+    "error": "Authentication service error",
+    "detail": "Internal authentication error"
+})
+
+# Token -> user cache so repeat requests with the same token skip JWT
+# verification and the user SELECT. Entries hold plain column values, never
+# ORM instances, and expire after the TTL or when the token itself expires.
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+AUTH_USER_CACHE_MAXSIZE = int(os.getenv("AUTH_USER_CACHE_MAXSIZE", "4096"))
+_auth_user_cache: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+
+def _token_cache_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def _get_cached_user(token: str) -> Optional[User]:
+    """Get a detached User for a cached token, or None on a miss"""
+    key = _token_cache_key(token)
+    entry = _auth_user_cache.get(key)
+    if entry is None:
+        return None
+    
+    expires_at, columns = entry
+    if time.monotonic() >= expires_at:
+        _auth_user_cache.pop(key, None)
+        return None
+    
+    _auth_user_cache.move_to_end(key)
+    # Fresh instance per request so handlers cannot mutate the cached state
+    return detached_user_from_snapshot(columns)
+
+
+def _cache_user(token: str, payload: Dict[str, Any], user: User):
+    """Cache the loaded columns of an authenticated user for this token"""
+    if AUTH_USER_CACHE_TTL <= 0:
+        return
+    
+    ttl = AUTH_USER_CACHE_TTL
+    token_exp = payload.get("exp")
+    if token_exp is not None:
+        ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+    
+    columns = user_column_snapshot(user)
+    
+    while len(_auth_user_cache) >= AUTH_USER_CACHE_MAXSIZE:
+        _auth_user_cache.popitem(last=False)
+    _auth_user_cache[_token_cache_key(token)] = (time.monotonic() + ttl, columns)
+
+
+def invalidate_auth_cache(token: Optional[str] = None):
+    """Evict one token (e.g. on logout) or the whole cache from the auth user cache"""
+    if token is None:
+        _auth_user_cache.clear()
+    else:
+        _auth_user_cache.pop(_token_cache_key(token), None)
+
+
+def _get_bearer_token(scope) -> Optional[str]:
+    """
+    Get the Bearer token from the raw ASGI headers
+
+    Scans the (lowercased) header byte pairs directly instead of building a
+    Headers mapping, and slices the prefix off instead of splitting.
+    """
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            if value[:7] == b"Bearer ":
+                return value[7:].decode("latin-1")
+            return None
+    return None
+
 
 @dataclass
 class AuthMiddlewareConfig(MiddlewareConfig):
@@ -41,6 +131,18 @@ class AuthMiddlewareConfig(MiddlewareConfig):
     # Enable request logging
     log_auth_attempts: bool = True
     
+    # Track unique users per endpoint in get_auth_stats()
+    track_users_by_endpoint: bool = True
+    
+    # Bounds for the per-endpoint unique user stats (least recently used
+    # endpoints are evicted; user counts saturate at the per-endpoint cap)
+    stats_max_endpoints: int = 2048
+    stats_max_users_per_endpoint: int = 1024
+    
+    # Prefix tuples built from the path lists, matched with a single str.startswith call
+    public_prefixes: Tuple[str, ...] = field(default=(), init=False, repr=False)
+    admin_prefixes: Tuple[str, ...] = field(default=(), init=False, repr=False)
+    
     def __post_init__(self):
         super().__post_init__()
         if self.public_paths is None:
@@ -65,6 +167,9 @@ class AuthMiddlewareConfig(MiddlewareConfig):
                 "/api/admin/",
                 "/api/system/"
             ]
+        
+        self.public_prefixes = tuple(self.public_paths)
+        self.admin_prefixes = tuple(self.admin_paths)
 
 
 class AuthMiddleware(BaseMiddleware):
@@ -81,29 +186,36 @@ class AuthMiddleware(BaseMiddleware):
             "public_requests": 0,
             "admin_requests": 0,
             "failed_auth_attempts": 0,
-            "users_by_endpoint": {},
+            "users_by_endpoint": OrderedDict(),
         }
         # Use structured logging
         self.middleware_logger = MiddlewareLogger("auth_middleware")
+        # TEST_MODE is fixed for the process lifetime, so resolve it (and the
+        # shared test user, treated as read-only downstream) once
+        self._test_mode = self._is_test_mode()
+        self._test_user = self._get_test_user() if self._test_mode else None
     
     async def dispatch(self, request: Request, call_next):
         """Process request through authentication middleware"""
         self.stats["total_requests"] += 1
         
+        # Raw ASGI scope values; request.url would parse a full URL object
+        path = request.scope["path"]
+        
         # Skip authentication for certain methods and paths
         if self.should_skip_request(request):
             self.stats["skipped_requests"] += 1
             return await call_next(request)
         
         # Check if path is public
-        if self._is_public_path(request.url.path):
+        if self._is_public_path(path):
             self.auth_stats["public_requests"] += 1
             self.stats["processed_requests"] += 1
             return await call_next(request)
         
         # In test mode, use test user without authentication
-        if self._is_test_mode():
-            user = self._get_test_user()
+        if self._test_mode:
+            user = self._test_user
             if self.config.inject_user_context:
                 request.state.user = user
                 request.state.user_id = "test"  # Use "test" as user ID in test mode
@@ -117,51 +229,56 @@ class AuthMiddleware(BaseMiddleware):
             user = await self._authenticate_request(request)
             
             if user:
+                # Stringify the id once and share it with downstream handlers
+                user_id = str(user.id)
+                
                 # Inject user context into request state
                 if self.config.inject_user_context:
                     request.state.user = user
-                    request.state.user_id = str(user.id)
+                    request.state.user_id = user_id
                     request.state.is_admin = user.is_admin
                 
                 # Check admin access for admin paths
-                if self._is_admin_path(request.url.path):
+                if self._is_admin_path(path):
                     if not user.is_admin:
-                        return JSONResponse(
+                        return Response(
+                            content=_ADMIN_REQUIRED_BODY,
                             status_code=status.HTTP_403_FORBIDDEN,
-                            content={
-                                "error": "Admin access required",
-                                "detail": "This endpoint requires administrator privileges"
-                            }
+                            media_type="application/json"
                         )
                     self.auth_stats["admin_requests"] += 1
                 
                 self.auth_stats["authenticated_requests"] += 1
                 self.stats["processed_requests"] += 1
                 
-                # Track user activity
-                endpoint = f"{request.method} {request.url.path}"
-                if endpoint not in self.auth_stats["users_by_endpoint"]:
-                    self.auth_stats["users_by_endpoint"][endpoint] = set()
-                self.auth_stats["users_by_endpoint"][endpoint].add(str(user.id))
-                
-                if self.config.log_auth_attempts:
-                    self.middleware_logger.log_request(
-                        request, 
-                        f"Authenticated user {user.email} accessing {endpoint}", 
-                        level="debug",
-                        user_id=str(user.id),
-                        user_email=user.email,
-                        endpoint=endpoint
-                    )
+                # Only build the endpoint key when stats or debug logging need it
+                log_attempt = (
+                    self.config.log_auth_attempts
+                    and self.middleware_logger.logger.isEnabledFor(logging.DEBUG)
+                )
+                if self.config.track_users_by_endpoint or log_attempt:
+                    endpoint = f"{request.scope['method']} {path}"
+                    
+                    # Track user activity
+                    if self.config.track_users_by_endpoint:
+                        self._track_endpoint_user(endpoint, user_id)
+                    
+                    if log_attempt:
+                        self.middleware_logger.log_request(
+                            request, 
+                            f"Authenticated user {user.email} accessing {endpoint}", 
+                            level="debug",
+                            user_id=user_id,
+                            user_email=user.email,
+                            endpoint=endpoint
+                        )
                 
             else:
                 # No valid authentication found
-                return JSONResponse(
+                return Response(
+                    content=_AUTH_REQUIRED_BODY,
                     status_code=status.HTTP_401_UNAUTHORIZED,
-                    content={
-                        "error": "Authentication required",
-                        "detail": "Valid authentication token required for this endpoint"
-                    },
+                    media_type="application/json",
                     headers={"WWW-Authenticate": "Bearer"}
                 )
         
@@ -176,7 +293,7 @@ class AuthMiddleware(BaseMiddleware):
                     error_detail=e.detail,
                     status_code=e.status_code
                 )
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=e.status_code,
                 content={"error": "Authentication failed", "detail": e.detail},
                 headers={"WWW-Authenticate": "Bearer"}
@@ -186,28 +303,37 @@ class AuthMiddleware(BaseMiddleware):
             self.auth_stats["failed_auth_attempts"] += 1
             self.stats["errors"] += 1
             self.middleware_logger.log_error(request, e, error_context="authentication_middleware")
-            return JSONResponse(
+            return Response(
+                content=_AUTH_SERVICE_ERROR_BODY,
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                content={"error": "Authentication service error", "detail": "Internal authentication error"}
+                media_type="application/json"
             )
         
         # Continue with authenticated request
         response = await call_next(request)
         return response
     
+    def _track_endpoint_user(self, endpoint: str, user_id: str):
+        """Record a user for an endpoint, keeping the stats bounded in memory"""
+        users_by_endpoint = self.auth_stats["users_by_endpoint"]
+        users = users_by_endpoint.get(endpoint)
+        if users is None:
+            while len(users_by_endpoint) >= self.config.stats_max_endpoints:
+                users_by_endpoint.popitem(last=False)
+            users = users_by_endpoint[endpoint] = set()
+        else:
+            users_by_endpoint.move_to_end(endpoint)
+        
+        if len(users) < self.config.stats_max_users_per_endpoint:
+            users.add(user_id)
+    
     def _is_public_path(self, path: str) -> bool:
         """Check if path is public (doesn't require authentication)"""
-        for public_path in self.config.public_paths:
-            if path.startswith(public_path):
-                return True
-        return False
+        return path.startswith(self.config.public_prefixes)
     
     def _is_admin_path(self, path: str) -> bool:
         """Check if path requires admin access"""
-        for admin_path in self.config.admin_paths:
-            if path.startswith(admin_path):
-                return True
-        return False
+        return path.startswith(self.config.admin_prefixes)
     
     def _is_test_mode(self) -> bool:
         """Check if test mode is enabled"""
@@ -235,26 +361,12 @@ class AuthMiddleware(BaseMiddleware):
     async def _authenticate_request(self, request: Request) -> Optional[User]:
         """Authenticate the request and return user if valid"""
         # Try Bearer token first
-        auth_header = request.headers.get("Authorization")
-        if auth_header and auth_header.startswith("Bearer "):
+        token = _get_bearer_token(request.scope)
+        if token:
             try:
-                # Extract token
-                token = auth_header.split(" ")[1]
-                
-                # Verify token
-                payload = auth_service.verify_token(token)
-                if payload:
-                    user_id = payload.get("sub")
-                    if user_id:
-                        # Get database session
-                        db = next(get_db())
-                        try:
-                            # Get user from database
-                            user = auth_service.get_user_by_id(db, user_id)
-                            if user and user.is_active:
-                                return user
-                        finally:
-                            db.close()
+                user = await self._resolve_token_user(token)
+                if user:
+                    return user
             except Exception as e:
                 logger.error(f"Bearer token verification error: {str(e)}")
         
@@ -263,25 +375,38 @@ class AuthMiddleware(BaseMiddleware):
             # Check for access_token cookie
             access_token = request.cookies.get("access_token")
             if access_token:
-                payload = auth_service.verify_token(access_token)
-                if payload:
-                    user_id = payload.get("sub")
-                    if user_id:
-                        # Get database session
-                        db = next(get_db())
-                        try:
-                            # Get user from database
-                            user = auth_service.get_user_by_id(db, user_id)
-                            if user and user.is_active:
-                                logger.debug(f"User authenticated via cookie: {user.email}")
-                                return user
-                        finally:
-                            db.close()
+                user = await self._resolve_token_user(access_token)
+                if user:
+                    logger.debug(f"User authenticated via cookie: {user.email}")
+                    return user
         except Exception as e:
             logger.error(f"Cookie authentication error: {str(e)}")
         
         return None
     
+    async def _resolve_token_user(self, token: str) -> Optional[User]:
+        """Resolve an active user for a token, using the token cache when possible"""
+        user = _get_cached_user(token)
+        if user is not None:
+            return user
+        
+        # Verify token
+        payload = auth_service.verify_token(token)
+        if not payload:
+            return None
+        
+        user_id = payload.get("sub")
+        if not user_id:
+            return None
+        
+        # Concurrent lookups are batched into one query per event loop tick
+        user = await auth_service.get_user_by_id_batched(user_id)
+        
+        if user and user.is_active:
+            _cache_user(token, payload, user)
+            return user
+        return None
+    
     def get_auth_stats(self) -> Dict[str, Any]:
         """Get authentication statistics"""
         # Convert sets to counts for JSON serialization
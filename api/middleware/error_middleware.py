@@ -4,44 +4,66 @@ Provides centralized error handling for all API endpoints
 """
 
 import logging
-import traceback
-from typing import Union
+from typing import Any, Dict, Union
+
+import orjson
 from fastapi import Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from api.services.errors import ErrorHandler, ErrorCodes
+from .utils import get_user_identifier
 
 logger = logging.getLogger(__name__)
 
 
-def get_user_identifier(request: Request) -> str:
-    """Extract user identifier from request"""
-    # Try to get user ID from request state (set by auth middleware)
-    if hasattr(request.state, 'user_id') and request.state.user_id:
-        return f"user:{request.state.user_id}"
+class ORJSONErrorResponse(JSONResponse):
+    """
+    JSON response rendered with orjson
     
-    # Try to get user ID from JWT token
-    auth_header = request.headers.get("Authorization")
-    if auth_header and auth_header.startswith("Bearer "):
-        try:
-            # This would need to be implemented with your JWT service
-            # token = auth_header.split(" ")[1]
-            # user_id = decode_jwt_token(token).get("user_id")
-            # if user_id:
-            #     return f"user:{user_id}"
-            pass
-        except Exception:
-            pass
+    Unlike fastapi's ORJSONResponse it falls back to str() for values orjson
+    cannot serialize (exceptions, custom objects in exc.detail or validation
+    inputs) and accepts non-string dict keys, so error handlers never fail
+    while rendering the error.
+    """
     
-    # Fallback to client IP
-    client_ip = request.client.host if request.client else "unknown"
-    forwarded_for = request.headers.get("X-Forwarded-For")
-    if forwarded_for:
-        client_ip = forwarded_for.split(",")[0].strip()
+    media_type = "application/json"
     
-    return f"ip:{client_ip}"
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _dump(content: Any) -> bytes:
+    """orjson encoding with the same fallbacks as ORJSONErrorResponse"""
+    return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+# Constant leading parts of the 500 and 422 bodies, encoded once. Handlers
+# encode only the per-request fields and splice them in after the prefix.
+_INTERNAL_ERROR_PREFIX = b'{"success":false,"error":' + _dump({
+    "error_code": ErrorCodes.INTERNAL_SERVER_ERROR,
+    "message": "An unexpected error occurred",
+    "details": "Please try again later or contact support if the problem persists"
+}) + b","
+_VALIDATION_ERROR_PREFIX = b'{"success":false,"error":' + _dump({
+    "error_code": ErrorCodes.VALIDATION_ERROR,
+    "message": "Validation failed"
+})[:-1] + b',"validation_errors":'
+
+
+def _spliced_error_response(status_code: int, prefix: bytes, request_fields: Dict[str, Any]) -> Response:
+    """
+    Build a JSON error response from a pre-encoded prefix
+    
+    ``prefix`` must end where the next key can begin; the encoded
+    ``request_fields`` object is appended without its opening brace.
+    """
+    return Response(
+        content=prefix + _dump(request_fields)[1:],
+        status_code=status_code,
+        media_type="application/json"
+    )
 
 
 class GlobalErrorHandler:
@@ -59,19 +81,22 @@ class GlobalErrorHandler:
         Returns:
             JSONResponse with error details
         """
-        # Get user identifier
+        # Per-request values, looked up once
+        path = request.url.path
+        method = request.method
+        request_id = getattr(request.state, 'request_id', None)
         user_id = get_user_identifier(request)
         
         # Log the error
         logger.warning(
-            f"HTTP {exc.status_code} error on {request.method} {request.url.path}: {exc.detail}",
+            f"HTTP {exc.status_code} error on {method} {path}: {exc.detail}",
             extra={
                 "status_code": exc.status_code,
-                "method": request.method,
-                "path": request.url.path,
+                "method": method,
+                "path": path,
                 "detail": exc.detail,
                 "user_id": user_id,
-                "request_id": getattr(request.state, 'request_id', None)
+                "request_id": request_id
             }
         )
         
@@ -84,20 +109,20 @@ class GlobalErrorHandler:
                 "message": str(exc.detail)
             }
         
-        return JSONResponse(
+        return ORJSONErrorResponse(
             status_code=exc.status_code,
             content={
                 "success": False,
                 "error": error_detail,
-                "path": request.url.path,
-                "method": request.method,
+                "path": path,
+                "method": method,
                 "user_id": user_id,
-                "request_id": getattr(request.state, 'request_id', None)
+                "request_id": request_id
             }
         )
     
     @staticmethod
-    async def validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
+    async def validation_exception_handler(request: Request, exc: RequestValidationError) -> Response:
         """
         Handle validation errors with detailed field information
         
@@ -106,24 +131,15 @@ class GlobalErrorHandler:
             exc: RequestValidationError instance
             
         Returns:
-            JSONResponse with validation error details
+            JSON Response with validation error details
         """
-        # Get user identifier
+        # Per-request values, looked up once
+        path = request.url.path
+        method = request.method
+        request_id = getattr(request.state, 'request_id', None)
         user_id = get_user_identifier(request)
         
-        # Log the validation error
-        logger.warning(
-            f"Validation error on {request.method} {request.url.path}: {exc.errors()}",
-            extra={
-                "method": request.method,
-                "path": request.url.path,
-                "errors": exc.errors(),
-                "user_id": user_id,
-                "request_id": getattr(request.state, 'request_id', None)
-            }
-        )
-        
-        # Format validation errors
+        # Format validation errors (shared by the log record and the response)
         formatted_errors = []
         for error in exc.errors():
             formatted_errors.append({
@@ -133,24 +149,34 @@ class GlobalErrorHandler:
                 "input": error.get("input")
             })
         
-        return JSONResponse(
-            status_code=422,
-            content={
-                "success": False,
-                "error": {
-                    "error_code": ErrorCodes.VALIDATION_ERROR,
-                    "message": "Validation failed",
-                    "validation_errors": formatted_errors
-                },
-                "path": request.url.path,
-                "method": request.method,
+        # Log the validation error (message formatted only if the record is emitted)
+        logger.warning(
+            "Validation error on %s %s: %s",
+            method,
+            path,
+            formatted_errors,
+            extra={
+                "method": method,
+                "path": path,
+                "errors": formatted_errors,
+                "user_id": user_id,
+                "request_id": request_id
+            }
+        )
+        
+        return _spliced_error_response(
+            422,
+            _VALIDATION_ERROR_PREFIX + _dump(formatted_errors) + b"},",
+            {
+                "path": path,
+                "method": method,
                 "user_id": user_id,
-                "request_id": getattr(request.state, 'request_id', None)
+                "request_id": request_id
             }
         )
     
     @staticmethod
-    async def general_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+    async def general_exception_handler(request: Request, exc: Exception) -> Response:
         """
         Handle general exceptions with proper logging and error format
         
@@ -161,36 +187,33 @@ class GlobalErrorHandler:
         Returns:
             JSONResponse with error details
         """
-        # Get user identifier
+        # Per-request values, looked up once
+        path = request.url.path
+        method = request.method
+        request_id = getattr(request.state, 'request_id', None)
         user_id = get_user_identifier(request)
         
-        # Log the full exception with traceback
+        # Log the full exception with traceback (exc_info is formatted only if emitted)
         logger.error(
-            f"Unhandled exception on {request.method} {request.url.path}: {str(exc)}",
+            f"Unhandled exception on {method} {path}: {str(exc)}",
             extra={
-                "method": request.method,
-                "path": request.url.path,
+                "method": method,
+                "path": path,
                 "exception_type": type(exc).__name__,
-                "traceback": traceback.format_exc(),
                 "user_id": user_id,
-                "request_id": getattr(request.state, 'request_id', None)
+                "request_id": request_id
             },
             exc_info=True
         )
         
-        return JSONResponse(
-            status_code=500,
-            content={
-                "success": False,
-                "error": {
-                    "error_code": ErrorCodes.INTERNAL_SERVER_ERROR,
-                    "message": "An unexpected error occurred",
-                    "details": "Please try again later or contact support if the problem persists"
-                },
-                "path": request.url.path,
-                "method": request.method,
+        return _spliced_error_response(
+            500,
+            _INTERNAL_ERROR_PREFIX,
+            {
+                "path": path,
+                "method": method,
                 "user_id": user_id,
-                "request_id": getattr(request.state, 'request_id', None)
+                "request_id": request_id
             }
         )
     
@@ -206,23 +229,26 @@ class GlobalErrorHandler:
         Returns:
             JSONResponse with error details
         """
-        # Get user identifier
+        # Per-request values, looked up once
+        path = request.url.path
+        method = request.method
+        request_id = getattr(request.state, 'request_id', None)
         user_id = get_user_identifier(request)
         
         # Log the error
         logger.warning(
-            f"Starlette HTTP {exc.status_code} error on {request.method} {request.url.path}: {exc.detail}",
+            f"Starlette HTTP {exc.status_code} error on {method} {path}: {exc.detail}",
             extra={
                 "status_code": exc.status_code,
-                "method": request.method,
-                "path": request.url.path,
+                "method": method,
+                "path": path,
                 "detail": exc.detail,
                 "user_id": user_id,
-                "request_id": getattr(request.state, 'request_id', None)
+                "request_id": request_id
             }
         )
         
-        return JSONResponse(
+        return ORJSONErrorResponse(
             status_code=exc.status_code,
             content={
                 "success": False,
@@ -230,10 +256,10 @@ class GlobalErrorHandler:
                     "error_code": ErrorCodes.INTERNAL_SERVER_ERROR,
                     "message": str(exc.detail)
                 },
-                "path": request.url.path,
-                "method": request.method,
+                "path": path,
+                "method": method,
                 "user_id": user_id,
-                "request_id": getattr(request.state, 'request_id', None)
+                "request_id": request_id
             }
         )
 
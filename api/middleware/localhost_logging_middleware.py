@@ -1,43 +1,62 @@
 """
-Custom logging middleware to replace 127.0.0.1 with localhost in all log messages
+Custom logging filter to replace 127.0.0.1 with localhost in all log messages
 """
 
 import logging
-import sys
-from typing import Any, Dict
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
 
+_LOOPBACK = "127.0.0.1"
 
-class LocalhostLoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware to replace 127.0.0.1 with localhost in all log messages"""
-    
-    def __init__(self, app, **kwargs):
-        super().__init__(app, **kwargs)
-        self._setup_logging_override()
+
+class LocalhostFilter(logging.Filter):
+    """
+    Filter that replaces 127.0.0.1 with localhost in log records
+
+    Only the message and string arguments that actually contain the address
+    are rewritten; everything else passes through after a substring check.
+    The argument tuple keeps its shape because formatters such as uvicorn's
+    AccessFormatter unpack it.
+    """
     
-    def _setup_logging_override(self):
-        """Override the root logger to replace 127.0.0.1 with localhost"""
-        # Get the root logger
-        root_logger = logging.getLogger()
-        
-        # Create a custom formatter that replaces 127.0.0.1 with localhost
-        class LocalhostFormatter(logging.Formatter):
-            def format(self, record):
-                # Get the original formatted message
-                formatted = super().format(record)
-                # Replace 127.0.0.1 with localhost
-                return formatted.replace('127.0.0.1', 'localhost')
+    def filter(self, record: logging.LogRecord) -> bool:
+        msg = record.msg
+        if isinstance(msg, str) and _LOOPBACK in msg:
+            record.msg = msg.replace(_LOOPBACK, "localhost")
         
-        # Apply the custom formatter to all handlers
-        for handler in root_logger.handlers:
-            handler.setFormatter(LocalhostFormatter())
-        
-        # Also override the uvicorn access logger specifically
-        uvicorn_access_logger = logging.getLogger("uvicorn.access")
-        for handler in uvicorn_access_logger.handlers:
-            handler.setFormatter(LocalhostFormatter())
+        args = record.args
+        if isinstance(args, tuple) and any(isinstance(arg, str) and _LOOPBACK in arg for arg in args):
+            record.args = tuple(
+                arg.replace(_LOOPBACK, "localhost") if isinstance(arg, str) else arg
+                for arg in args
+            )
+        return True
+
+
+_localhost_filter = LocalhostFilter()
+_installed = False
+
+
+def install_localhost_log_filter():
+    """
+    Replace 127.0.0.1 with localhost in every log record
+
+    Applies the filter from the log record factory, so it covers records
+    from all loggers, including handlers added after this runs (uvicorn
+    configures its own in each worker). Runs once at import; later calls
+    are no-ops.
+    """
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    
+    base_factory = logging.getLogRecordFactory()
     
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        return response
+    def localhost_record_factory(*args, **kwargs):
+        record = base_factory(*args, **kwargs)
+        _localhost_filter.filter(record)
+        return record
+    
+    logging.setLogRecordFactory(localhost_record_factory)
+
+
+install_localhost_log_filter()
@@ -3,47 +3,32 @@
 MONITORING MIDDLEWARE
 FastAPI middleware for comprehensive monitoring, metrics, and observability
 """
+from array import array
+import bisect
+import hashlib
+import math
+import os
+import threading
 import time
 import logging
 import json
-from typing import Dict, Optional, Any
-from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Any, Tuple
+from dataclasses import dataclass, field
 from collections import defaultdict, deque
 import asyncio
+from contextlib import contextmanager, nullcontext
 
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-
-logger = logging.getLogger(__name__)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from .utils import (
+    TopKCounter,
+    get_client_ip_from_scope,
+    get_scope_header,
+    get_user_identifier_from_scope,
+)
 
-def get_user_identifier(request: Request) -> str:
-    """Extract user identifier from request"""
-    # Try to get user ID from request state (set by auth middleware)
-    if hasattr(request.state, 'user_id') and request.state.user_id:
-        return f"user:{request.state.user_id}"
-    
-    # Try to get user ID from JWT token
-    auth_header = request.headers.get("Authorization")
-    if auth_header and auth_header.startswith("Bearer "):
-        try:
-            # This would need to be implemented with your JWT service
-            # token = auth_header.split(" ")[1]
-            # user_id = decode_jwt_token(token).get("user_id")
-            # if user_id:
-            #     return f"user:{user_id}"
-            pass
-        except Exception:
-            pass
-    
-    # Fallback to client IP
-    client_ip = request.client.host if request.client else "unknown"
-    forwarded_for = request.headers.get("X-Forwarded-For")
-    if forwarded_for:
-        client_ip = forwarded_for.split(",")[0].strip()
-    
-    return f"ip:{client_ip}"
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -61,118 +46,274 @@ class MonitoringConfig:
     log_request_body: bool = False
     log_response_body: bool = False
     
+    # Lookup forms of skip_paths/skip_methods, derived in __post_init__
+    skip_prefixes: Tuple[str, ...] = field(default=(), init=False, repr=False)
+    skip_method_set: FrozenSet[str] = field(default=frozenset(), init=False, repr=False)
+    
     def __post_init__(self):
         if self.skip_paths is None:
             self.skip_paths = ["/health", "/docs", "/openapi.json", "/redoc", "/metrics"]
         if self.skip_methods is None:
             self.skip_methods = ["HEAD", "OPTIONS"]
+        
+        # Skip paths are prefixes; str.startswith(tuple) checks them all in one call
+        self.skip_prefixes = tuple(self.skip_paths)
+        self.skip_method_set = frozenset(self.skip_methods)
+
+
+class LatencyHistogram:
+    """
+    Log-scale latency histogram for streaming percentiles
+
+    Bucket bounds grow geometrically from ``min_value`` to ``max_value``
+    seconds, so every reported percentile is within ``precision`` (relative)
+    of the true value. Recording is a binary search over the bounds and a
+    percentile is one walk over the bucket counts, independent of how many
+    values were recorded. Values can be removed again, which lets the
+    histogram track a sliding window.
+    """
+    
+    def __init__(self, min_value: float = 0.0001, max_value: float = 60.0, precision: float = 0.05):
+        growth = 1 + precision
+        bucket_count = math.ceil(math.log(max_value / min_value, growth)) + 1
+        # Upper bound of each bucket; the last bucket also takes anything larger
+        self.bounds = [min_value * growth ** i for i in range(bucket_count)]
+        self.counts = [0] * bucket_count
+        self.count = 0
+        self.total = 0.0
+    
+    def _bucket(self, value: float) -> int:
+        return min(bisect.bisect_left(self.bounds, value), len(self.bounds) - 1)
+    
+    def record(self, value: float):
+        """Add a value"""
+        self.counts[self._bucket(value)] += 1
+        self.count += 1
+        self.total += value
+    
+    def remove(self, value: float):
+        """Remove a previously recorded value"""
+        self.counts[self._bucket(value)] -= 1
+        self.count -= 1
+        self.total = self.total - value if self.count else 0.0
+    
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0
+    
+    def percentile(self, fraction: float) -> float:
+        """Get the value at ``fraction`` (0-1), as the upper bound of its bucket"""
+        if not self.count:
+            return 0
+        # Same rank as indexing a sorted list with int(n * fraction)
+        rank = min(int(self.count * fraction), self.count - 1)
+        seen = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            seen += bucket_count
+            if seen > rank:
+                return bound
+        return self.bounds[-1]
+
+
+class CardinalityEstimator:
+    """
+    HyperLogLog distinct-value counter
+
+    Estimates how many distinct strings were added in a fixed 2**precision
+    bytes (4 KB by default, ~1.6% standard error; small counts are near
+    exact), instead of keeping every value in a set. Supports ``add`` and
+    ``len`` like the set it replaces.
+    """
+    
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.register_count = 1 << precision
+        self.registers = bytearray(self.register_count)
+        self._alpha = 0.7213 / (1 + 1.079 / self.register_count)
+    
+    def add(self, value: str):
+        hashed = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        rest_bits = 64 - self.precision
+        index = hashed >> rest_bits
+        rest = hashed & ((1 << rest_bits) - 1)
+        # Position of the leftmost 1 bit in the remaining bits
+        rank = rest_bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+    
+    def __len__(self) -> int:
+        m = self.register_count
+        estimate = self._alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+# Number of most recent response times the latency summary covers
+RESPONSE_TIME_WINDOW = 10000
 
 
 class MetricsCollector:
-    """Collects and stores application metrics"""
+    """
+    Collects and stores application metrics
+
+    Each worker process has its own collector, so a summary covers the
+    worker that served it (identified by ``worker_pid``). Updates and
+    summaries are serialized by a lock, so threads (sync endpoints, the
+    threadpool) can use the collector alongside the event loop.
+    """
     
     def __init__(self, retention_hours: int = 24):
         self.retention_hours = retention_hours
         self.retention_seconds = retention_hours * 3600
+        self._lock = threading.Lock()
+        
+        # Request records waiting to be aggregated (see record_request)
+        self._pending = deque()
+        self.pending_batch_size = 256
         
         # Request metrics
         self.request_count = 0
-        self.request_count_by_endpoint = defaultdict(int)
+        self.request_count_by_endpoint = TopKCounter()
         self.request_count_by_method = defaultdict(int)
         self.request_count_by_status = defaultdict(int)
         
         # Performance metrics
-        self.response_times = deque(maxlen=10000)
-        self.response_times_by_endpoint = defaultdict(lambda: deque(maxlen=1000))
+        # Last RESPONSE_TIME_WINDOW response times as a float32 ring buffer
+        # (4 bytes per entry instead of a boxed float per deque slot)
+        self.response_times = array("f", bytes(4 * RESPONSE_TIME_WINDOW))
+        self.response_times_index = 0
+        self.response_times_count = 0
+        # Summary of the response_times window, updated as values enter and leave it
+        self.response_time_histogram = LatencyHistogram()
         self.slow_requests = deque(maxlen=1000)
         
         # Error metrics
         self.error_count = 0
-        self.error_count_by_endpoint = defaultdict(int)
-        self.error_count_by_type = defaultdict(int)
+        self.error_count_by_endpoint = TopKCounter()
+        self.error_count_by_type = TopKCounter()
         
         # System metrics
         self.active_requests = 0
         self.max_concurrent_requests = 0
         
         # Client metrics
-        self.unique_clients = set()
-        self.requests_by_client = defaultdict(int)
+        self.unique_clients = CardinalityEstimator()
+        self.requests_by_client = TopKCounter()
         
         # User metrics
-        self.unique_users = set()
-        self.requests_by_user = defaultdict(int)
-        self.user_activity = defaultdict(lambda: deque(maxlen=1000))
+        self.unique_users = CardinalityEstimator()
+        self.requests_by_user = TopKCounter()
+        # Per-user activity as parallel deques (timestamps, response times) -
+        # the only fields summarized - instead of one dict per request
+        self.user_activity_timestamps = defaultdict(lambda: deque(maxlen=1000))
+        self.user_activity_response_times = defaultdict(lambda: deque(maxlen=1000))
         
-        # Last cleanup time
-        self.last_cleanup = time.time()
+        # Last cleanup time (monotonic, unaffected by wall clock adjustments)
+        self.last_cleanup = time.monotonic()
     
     def record_request(self, method: str, endpoint: str, status_code: int, 
                       response_time: float, client_ip: str, user_id: str = None, error: Optional[str] = None):
-        """Record a request metric"""
-        current_time = time.time()
-        
-        # Basic request metrics
-        self.request_count += 1
-        self.request_count_by_endpoint[endpoint] += 1
-        self.request_count_by_method[method] += 1
-        self.request_count_by_status[status_code] += 1
-        
-        # Performance metrics
-        self.response_times.append(response_time)
-        self.response_times_by_endpoint[endpoint].append(response_time)
-        
-        # Client metrics
-        self.unique_clients.add(client_ip)
-        self.requests_by_client[client_ip] += 1
+        """
+        Record a request metric
         
-        # User metrics
-        if user_id and user_id.startswith("user:"):
-            user_identifier = user_id
-            self.unique_users.add(user_identifier)
-            self.requests_by_user[user_identifier] += 1
-            self.user_activity[user_identifier].append({
-                "timestamp": current_time,
-                "method": method,
-                "endpoint": endpoint,
-                "status_code": status_code,
-                "response_time": response_time
-            })
-        
-        # Error metrics
-        if status_code >= 400 or error:
-            self.error_count += 1
-            self.error_count_by_endpoint[endpoint] += 1
-            if error:
-                self.error_count_by_type[error] += 1
-        
-        # Cleanup old data periodically
-        if current_time - self.last_cleanup > 3600:  # Every hour
-            self._cleanup_old_data()
-            self.last_cleanup = current_time
+        Only queues the values (deque.append is atomic, so no lock is taken);
+        they are aggregated in batches by _drain_pending, either once enough
+        have queued up or when a summary is requested.
+        """
+        pending = self._pending
+        pending.append((method, endpoint, status_code, response_time, client_ip, user_id, error, time.time()))
+        if len(pending) >= self.pending_batch_size:
+            self._drain_pending()
+    
+    def _drain_pending(self):
+        """Aggregate all queued request records"""
+        with self._lock:
+            pending = self._pending
+            response_times = self.response_times
+            index = self.response_times_index
+            histogram = self.response_time_histogram
+            
+            while pending:
+                method, endpoint, status_code, response_time, client_ip, user_id, error, timestamp = pending.popleft()
+                
+                # Basic request metrics
+                self.request_count += 1
+                self.request_count_by_endpoint.add(endpoint)
+                self.request_count_by_method[method] += 1
+                self.request_count_by_status[status_code] += 1
+                
+                # Performance metrics
+                if self.response_times_count == RESPONSE_TIME_WINDOW:
+                    histogram.remove(response_times[index])
+                else:
+                    self.response_times_count += 1
+                response_times[index] = response_time
+                # Record the stored float32 value so its later removal hits the same bucket
+                histogram.record(response_times[index])
+                index = (index + 1) % RESPONSE_TIME_WINDOW
+                
+                # Client metrics
+                self.unique_clients.add(client_ip)
+                self.requests_by_client.add(client_ip)
+                
+                # User metrics
+                if user_id and user_id.startswith("user:"):
+                    self.unique_users.add(user_id)
+                    self.requests_by_user.add(user_id)
+                    self.user_activity_timestamps[user_id].append(timestamp)
+                    self.user_activity_response_times[user_id].append(response_time)
+                
+                # Error metrics
+                if status_code >= 400 or error:
+                    self.error_count += 1
+                    self.error_count_by_endpoint.add(endpoint)
+                    if error:
+                        self.error_count_by_type.add(error)
+            
+            self.response_times_index = index
+            
+            # Cleanup old data periodically
+            now = time.monotonic()
+            if now - self.last_cleanup > 3600:  # Every hour
+                self._cleanup_old_data()
+                self.last_cleanup = now
     
     def record_slow_request(self, method: str, endpoint: str, response_time: float, 
                            client_ip: str, user_id: str = None, request_size: int = 0, response_size: int = 0):
         """Record a slow request"""
-        self.slow_requests.append({
-            "timestamp": time.time(),
-            "method": method,
-            "endpoint": endpoint,
-            "response_time": response_time,
-            "client_ip": client_ip,
-            "user_id": user_id,
-            "request_size": request_size,
-            "response_size": response_size
-        })
+        with self._lock:
+            self.slow_requests.append({
+                "timestamp": time.time(),
+                "method": method,
+                "endpoint": endpoint,
+                "response_time": response_time,
+                "client_ip": client_ip,
+                "user_id": user_id,
+                "request_size": request_size,
+                "response_size": response_size
+            })
     
     def increment_active_requests(self):
         """Increment active request counter"""
-        self.active_requests += 1
-        self.max_concurrent_requests = max(self.max_concurrent_requests, self.active_requests)
+        with self._lock:
+            self.active_requests += 1
+            self.max_concurrent_requests = max(self.max_concurrent_requests, self.active_requests)
     
     def decrement_active_requests(self):
         """Decrement active request counter"""
-        self.active_requests = max(0, self.active_requests - 1)
+        with self._lock:
+            self.active_requests = max(0, self.active_requests - 1)
+    
+    @contextmanager
+    def active_request(self):
+        """Count a request as active for the duration of the block, however it exits"""
+        self.increment_active_requests()
+        try:
+            yield
+        finally:
+            self.decrement_active_requests()
     
     def _cleanup_old_data(self):
         """Clean up old data beyond retention period"""
@@ -184,105 +325,119 @@ class MetricsCollector:
     
     def get_metrics_summary(self) -> Dict[str, Any]:
         """Get comprehensive metrics summary"""
-        # Calculate average response times
-        avg_response_time = sum(self.response_times) / len(self.response_times) if self.response_times else 0
-        
-        # Calculate percentiles
-        sorted_times = sorted(self.response_times)
-        p50 = sorted_times[len(sorted_times) // 2] if sorted_times else 0
-        p95 = sorted_times[int(len(sorted_times) * 0.95)] if sorted_times else 0
-        p99 = sorted_times[int(len(sorted_times) * 0.99)] if sorted_times else 0
-        
-        return {
-            "request_metrics": {
-                "total_requests": self.request_count,
-                "requests_per_endpoint": dict(self.request_count_by_endpoint),
-                "requests_per_method": dict(self.request_count_by_method),
-                "requests_per_status": dict(self.request_count_by_status),
-                "unique_clients": len(self.unique_clients),
-                "active_requests": self.active_requests,
-                "max_concurrent_requests": self.max_concurrent_requests,
-            },
-            "performance_metrics": {
-                "average_response_time_ms": round(avg_response_time * 1000, 2),
-                "response_time_p50_ms": round(p50 * 1000, 2),
-                "response_time_p95_ms": round(p95 * 1000, 2),
-                "response_time_p99_ms": round(p99 * 1000, 2),
-                "slow_requests_count": len(self.slow_requests),
-            },
-            "error_metrics": {
-                "total_errors": self.error_count,
-                "error_rate_percent": round((self.error_count / max(1, self.request_count)) * 100, 2),
-                "errors_per_endpoint": dict(self.error_count_by_endpoint),
-                "errors_per_type": dict(self.error_count_by_type),
-            },
-            "client_metrics": {
-                "top_clients": dict(sorted(self.requests_by_client.items(), key=lambda x: x[1], reverse=True)[:10])
-            },
-            "user_metrics": {
-                "unique_users": len(self.unique_users),
-                "top_users": dict(sorted(self.requests_by_user.items(), key=lambda x: x[1], reverse=True)[:10]),
-                "user_activity_summary": {
-                    user_id: {
-                        "total_requests": len(activity),
-                        "last_activity": max([a["timestamp"] for a in activity]) if activity else 0,
-                        "avg_response_time": sum([a["response_time"] for a in activity]) / len(activity) if activity else 0
-                    }
-                    for user_id, activity in self.user_activity.items()
+        self._drain_pending()
+        with self._lock:
+            # Average and percentiles over the response time window (no sort per call)
+            histogram = self.response_time_histogram
+            avg_response_time = histogram.mean()
+            p50 = histogram.percentile(0.5)
+            p95 = histogram.percentile(0.95)
+            p99 = histogram.percentile(0.99)
+            
+            user_activity_summary = {}
+            for user_id, timestamps in self.user_activity_timestamps.items():
+                response_times = self.user_activity_response_times[user_id]
+                user_activity_summary[user_id] = {
+                    "total_requests": len(timestamps),
+                    # Appended in order, so the newest entry is the latest activity
+                    "last_activity": timestamps[-1] if timestamps else 0,
+                    "avg_response_time": sum(response_times) / len(response_times) if response_times else 0
+                }
+            
+            return {
+                "worker_pid": os.getpid(),
+                "request_metrics": {
+                    "total_requests": self.request_count,
+                    "requests_per_endpoint": self.request_count_by_endpoint.to_dict(),
+                    "requests_per_method": dict(self.request_count_by_method),
+                    "requests_per_status": dict(self.request_count_by_status),
+                    "unique_clients": len(self.unique_clients),
+                    "active_requests": self.active_requests,
+                    "max_concurrent_requests": self.max_concurrent_requests,
+                },
+                "performance_metrics": {
+                    "average_response_time_ms": round(avg_response_time * 1000, 2),
+                    "response_time_p50_ms": round(p50 * 1000, 2),
+                    "response_time_p95_ms": round(p95 * 1000, 2),
+                    "response_time_p99_ms": round(p99 * 1000, 2),
+                    "slow_requests_count": len(self.slow_requests),
+                },
+                "error_metrics": {
+                    "total_errors": self.error_count,
+                    "error_rate_percent": round((self.error_count / max(1, self.request_count)) * 100, 2),
+                    "errors_per_endpoint": self.error_count_by_endpoint.to_dict(),
+                    "errors_per_type": self.error_count_by_type.to_dict(),
+                },
+                "client_metrics": {
+                    "top_clients": self.requests_by_client.most_common(10)
+                },
+                "user_metrics": {
+                    "unique_users": len(self.unique_users),
+                    "top_users": self.requests_by_user.most_common(10),
+                    "user_activity_summary": user_activity_summary
                 }
             }
-        }
 
 
-class MonitoringMiddleware(BaseHTTPMiddleware):
-    """Middleware for comprehensive monitoring and observability"""
+class MonitoringMiddleware:
+    """
+    Middleware for comprehensive monitoring and observability
+
+    Implemented as plain ASGI rather than BaseHTTPMiddleware: the status code
+    and response size are read off the ``send`` messages as they pass, so no
+    Request/Response objects or extra task are created per request.
+    """
     
     def __init__(
         self,
-        app,
+        app: ASGIApp,
         config: Optional[MonitoringConfig] = None,
         metrics_collector: Optional[MetricsCollector] = None,
     ):
-        super().__init__(app)
+        self.app = app
         self.config = config or MonitoringConfig()
         self.metrics = metrics_collector or MetricsCollector(self.config.metrics_retention_hours)
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Process request through monitoring middleware"""
-        start_time = time.time()
-        client_ip = self._get_client_ip(request)
-        user_id = get_user_identifier(request)
-        request_size = 0
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        # Skip monitoring for certain paths and methods
+        if self._should_skip_request(scope):
+            await self.app(scope, receive, send)
+            return
+        
+        # perf_counter is monotonic, so latencies survive wall clock steps
+        start_time = time.perf_counter()
+        method = scope["method"]
+        path = scope["path"]
+        client_ip = get_client_ip_from_scope(scope)
+        status_code = 500
         response_size = 0
         error = None
-        response: Optional[Response] = None
         
-        # Skip monitoring for certain paths and methods
-        if self._should_skip_request(request):
-            response = await call_next(request)
-            return response
+        async def send_wrapper(message: Message):
+            nonlocal status_code, response_size
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                status_code = message["status"]
+            elif message_type == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
         
         # Track active requests
-        if self.config.enable_metrics:
-            self.metrics.increment_active_requests()
+        active_request = self.metrics.active_request() if self.config.enable_metrics else nullcontext()
         
         try:
-            # Log request if enabled
-            if self.config.enable_request_logging:
-                await self._log_request(request, client_ip)
-            
-            # Get request size
-            if hasattr(request, '_body') and request._body:
-                request_size = len(request._body)
-            
-            # Process request
-            response = await call_next(request)
-            
-            # Get response size
-            if hasattr(response, 'body') and response.body:
-                response_size = len(response.body)
-            
-            return response
+            with active_request:
+                # Log request if enabled
+                if self.config.enable_request_logging:
+                    receive = await self._log_request(scope, receive, client_ip)
+                
+                # Process request
+                await self.app(scope, receive, send_wrapper)
             
         except Exception as e:
             error = str(e)
@@ -291,18 +446,15 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
             
         finally:
             # Calculate response time
-            response_time = time.time() - start_time
+            response_time = time.perf_counter() - start_time
             
             # Record metrics
             if self.config.enable_metrics:
-                status_code = 500
-                try:
-                    status_code = response.status_code if response is not None else 500
-                except Exception:
-                    status_code = 500
+                # Read after the app ran so the auth middleware's user is included
+                user_id = get_user_identifier_from_scope(scope, client_ip)
                 self.metrics.record_request(
-                    method=request.method,
-                    endpoint=request.url.path,
+                    method=method,
+                    endpoint=path,
                     status_code=status_code,
                     response_time=response_time,
                     client_ip=client_ip,
@@ -310,12 +462,17 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
                     error=error
                 )
                 
+                is_slow = response_time > (self.config.performance_threshold_ms / 1000)
+                if is_slow:
+                    # Declared body size from the headers; the body itself is never buffered
+                    content_length = get_scope_header(scope, b"content-length")
+                    request_size = int(content_length) if content_length and content_length.isdigit() else 0
+                
                 # Record slow requests
-                if (self.config.enable_performance_tracking and 
-                    response_time > (self.config.performance_threshold_ms / 1000)):
+                if self.config.enable_performance_tracking and is_slow:
                     self.metrics.record_slow_request(
-                        method=request.method,
-                        endpoint=request.url.path,
+                        method=method,
+                        endpoint=path,
                         response_time=response_time,
                         client_ip=client_ip,
                         user_id=user_id,
@@ -324,14 +481,13 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
                     )
                 
                 # Log slow requests
-                if (self.config.log_slow_requests and 
-                    response_time > (self.config.performance_threshold_ms / 1000)):
+                if self.config.log_slow_requests and is_slow:
                     logger.warning(
-                        f"Slow request detected: {request.method} {request.url.path} "
+                        f"Slow request detected: {method} {path} "
                         f"took {response_time:.3f}s (threshold: {self.config.performance_threshold_ms}ms)",
                         extra={
-                            "method": request.method,
-                            "path": request.url.path,
+                            "method": method,
+                            "path": path,
                             "response_time": response_time,
                             "client_ip": client_ip,
                             "user_id": user_id,
@@ -339,55 +495,58 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
                             "response_size": response_size
                         }
                     )
-                
-                # Decrement active requests
-                self.metrics.decrement_active_requests()
     
-    def _should_skip_request(self, request: Request) -> bool:
+    def _should_skip_request(self, scope: Scope) -> bool:
         """Check if request should be skipped"""
-        # Skip by method
-        if request.method in self.config.skip_methods:
-            return True
-        
-        # Skip by path
-        for skip_path in self.config.skip_paths:
-            if request.url.path.startswith(skip_path):
-                return True
-        
-        return False
-    
-    def _get_client_ip(self, request: Request) -> str:
-        """Get client IP address"""
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        return request.client.host if request.client else "unknown"
+        config = self.config
+        return scope["method"] in config.skip_method_set or scope["path"].startswith(config.skip_prefixes)
     
-    async def _log_request(self, request: Request, client_ip: str):
-        """Log request details"""
-        user_id = get_user_identifier(request)
+    async def _log_request(self, scope: Scope, receive: Receive, client_ip: str) -> Receive:
+        """
+        Log request details
+
+        Returns the receive channel the app should use: when the request body
+        is logged it has already been consumed here, so it is replayed.
+        """
+        if not logger.isEnabledFor(logging.INFO):
+            return receive
+        
+        method = scope["method"]
+        path = scope["path"]
         log_data = {
             "timestamp": time.time(),
-            "method": request.method,
-            "path": request.url.path,
-            "query_params": str(request.query_params),
+            "method": method,
+            "path": path,
+            "query_params": scope.get("query_string", b"").decode("latin-1"),
             "client_ip": client_ip,
-            "user_id": user_id,
-            "user_agent": request.headers.get("User-Agent", "unknown"),
-            "content_type": request.headers.get("Content-Type", "unknown"),
-            "content_length": request.headers.get("Content-Length", "0"),
+            "user_id": get_user_identifier_from_scope(scope, client_ip),
+            "user_agent": get_scope_header(scope, b"user-agent") or "unknown",
+            "content_type": get_scope_header(scope, b"content-type") or "unknown",
+            "content_length": get_scope_header(scope, b"content-length") or "0",
         }
         
         # Add request body if enabled (be careful with sensitive data)
-        if self.config.log_request_body and request.method in ["POST", "PUT", "PATCH"]:
+        if self.config.log_request_body and method in ["POST", "PUT", "PATCH"]:
             try:
-                body = await request.body()
+                body = await Request(scope, receive).body()
                 if body and len(body) < 1000:  # Only log small bodies
                     log_data["request_body"] = body.decode("utf-8", errors="ignore")
             except Exception:
                 pass  # Don't fail on body reading errors
+            else:
+                replayed = False
+                
+                async def replay_receive() -> Message:
+                    nonlocal replayed
+                    if not replayed:
+                        replayed = True
+                        return {"type": "http.request", "body": body, "more_body": False}
+                    return await receive()
+                
+                receive = replay_receive
         
-        logger.info(f"Request: {request.method} {request.url.path}", extra=log_data)
+        logger.info("Request: %s %s", method, path, extra=log_data)
+        return receive
     
     def get_metrics(self) -> Dict[str, Any]:
         """Get current metrics"""
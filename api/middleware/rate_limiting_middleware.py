@@ -5,43 +5,86 @@ FastAPI middleware for API rate limiting and abuse prevention
 """
 import time
 import logging
-from typing import Dict, List, Optional, Tuple
-from collections import defaultdict, deque
-from dataclasses import dataclass
+import os
+import threading
+import zlib
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple, Union
+from collections import OrderedDict
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+
+import orjson
 
 from fastapi import Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 from starlette.middleware.base import BaseHTTPMiddleware
 
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+from .utils import TopKCounter, get_client_ip_from_scope, get_scope_header, get_user_identifier
+
 logger = logging.getLogger(__name__)
 
 
-def get_user_identifier(request: Request) -> str:
-    """Extract user identifier from request"""
-    # Try to get user ID from request state (set by auth middleware)
-    if hasattr(request.state, 'user_id') and request.state.user_id:
-        return f"user:{request.state.user_id}"
-    
-    # Try to get user ID from JWT token
-    auth_header = request.headers.get("Authorization")
-    if auth_header and auth_header.startswith("Bearer "):
-        try:
-            # This would need to be implemented with your JWT service
-            # token = auth_header.split(" ")[1]
-            # user_id = decode_jwt_token(token).get("user_id")
-            # if user_id:
-            #     return f"user:{user_id}"
-            pass
-        except Exception:
-            pass
-    
-    # Fallback to client IP
-    client_ip = request.client.host if request.client else "unknown"
-    forwarded_for = request.headers.get("X-Forwarded-For")
-    if forwarded_for:
-        client_ip = forwarded_for.split(",")[0].strip()
-    
-    return f"ip:{client_ip}"
+# Constant leading part of the 429 body, encoded once; the limit details and
+# the per-request fields are appended after it
+_RATE_LIMITED_PREFIX = b'{"success":false,"error":' + orjson.dumps({
+    "code": "RATE_LIMIT_EXCEEDED",
+    "message": "Rate limit exceeded. Please try again later."
+})[:-1] + b',"details":'
+
+
+# Endpoints under this prefix always get client (IP) limits, see RateLimitConfig
+_AUTH_PATH_PREFIX = "/api/auth/"
+
+
+# Limit window units in seconds
+_TIME_MULTIPLIERS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400
+}
+
+
+class ParsedLimit(NamedTuple):
+    """A limit string such as "100/minute", parsed once"""
+    raw: str
+    max_requests: int
+    window_seconds: int
+    unit: str
+    window_ns: int  # window length, and the size of one token in bucket units
+    capacity: int  # a full bucket in bucket units (max_requests * window_ns)
+
+
+@lru_cache(maxsize=256)
+def _parse_limit(limit: str) -> Optional[ParsedLimit]:
+    """Parse a limit string, or return None for malformed limits (which are not enforced)"""
+    count, separator, time_unit = limit.partition("/")
+    if not separator:
+        return None
+    
+    try:
+        max_requests = int(count)
+    except ValueError:
+        return None
+    
+    window_seconds = _TIME_MULTIPLIERS.get(time_unit)
+    if window_seconds is None or max_requests <= 0:
+        return None
+    
+    window_ns = window_seconds * 1_000_000_000
+    return ParsedLimit(
+        limit, max_requests, window_seconds, time_unit, window_ns, max_requests * window_ns
+    )
+
+
+def _parse_limits(limits: List[str]) -> Tuple[ParsedLimit, ...]:
+    return tuple(parsed for parsed in map(_parse_limit, limits) if parsed is not None)
 
 
 @dataclass
@@ -53,8 +96,21 @@ class RateLimitConfig:
     skip_methods: List[str] = None
     enable_logging: bool = True
     enable_metrics: bool = True
-    storage_backend: str = "memory"  # memory, redis
+    storage_backend: str = "memory"  # memory, sharded (thread-safe memory), redis
     redis_url: Optional[str] = None
+    # Split clients behind one IP by user agent; disable to key clients by IP alone
+    client_id_include_user_agent: bool = True
+    # Authenticated requests are limited per user; set to also apply the
+    # client limits to them everywhere, not just on auth endpoints
+    check_client_limits_when_authenticated: bool = False
+    
+    # Parsed forms of the limits and skip lists, derived in __post_init__
+    parsed_default_limits: Tuple[ParsedLimit, ...] = field(default=(), init=False, repr=False)
+    path_limits: Dict[str, Tuple[ParsedLimit, ...]] = field(default_factory=dict, init=False, repr=False)
+    skip_prefixes: Tuple[str, ...] = field(default=(), init=False, repr=False)
+    skip_method_set: FrozenSet[str] = field(default=frozenset(), init=False, repr=False)
+    # Endpoints whose client limits apply even to authenticated requests
+    client_limited_paths: FrozenSet[str] = field(default=frozenset(), init=False, repr=False)
     
     def __post_init__(self):
         if self.default_limits is None:
@@ -71,90 +127,289 @@ class RateLimitConfig:
             self.skip_paths = ["/health", "/docs", "/openapi.json", "/redoc"]
         if self.skip_methods is None:
             self.skip_methods = ["GET", "HEAD", "OPTIONS"]
+        
+        # Parse every limit once; endpoints get the defaults followed by their own limits
+        self.parsed_default_limits = _parse_limits(self.default_limits)
+        self.path_limits = {
+            path: self.parsed_default_limits + _parse_limits(limits)
+            for path, limits in self.per_endpoint_limits.items()
+        }
+        # Skip paths are prefixes; str.startswith(tuple) checks them all in one call
+        self.skip_prefixes = tuple(self.skip_paths)
+        self.skip_method_set = frozenset(self.skip_methods)
+        # Auth endpoints are where brute force comes from one client across
+        # accounts, so they keep client limits whatever the user
+        self.client_limited_paths = frozenset(
+            path for path in self.per_endpoint_limits if path.startswith(_AUTH_PATH_PREFIX)
+        )
+
+
+def _check_and_consume_buckets(
+    storage_for_key: Callable[[str], "RateLimitStorage"],
+    keys: List[str],
+    limits: Tuple[ParsedLimit, ...],
+) -> Tuple[bool, Dict]:
+    """
+    Check every limit for every key and, if all pass, take one token from each
+    
+    Returns the info of the failing limit, or of the most restrictive limit
+    (lowest max requests, first key on ties) for the response headers.
+    Callers must hold whatever locks guard the storages involved.
+    """
+    most_restrictive = None
+    min_max = float('inf')
+    for key in keys:
+        storage = storage_for_key(key)
+        for limit in limits:
+            is_allowed, limit_info = storage.is_allowed(key, limit)
+            if not is_allowed:
+                return False, limit_info
+            if limit.max_requests < min_max:
+                min_max = limit.max_requests
+                most_restrictive = limit_info
+    
+    for key in keys:
+        storage_for_key(key).add_request(key)
+    return True, most_restrictive or {}
 
 
 class RateLimitStorage:
-    """In-memory storage for rate limiting"""
-    
-    def __init__(self):
-        self.requests: Dict[str, deque] = defaultdict(deque)
-        self.cleanup_interval = 300  # 5 minutes
-        self.last_cleanup = time.time()
-    
-    def _cleanup_old_requests(self):
-        """Remove old request records"""
-        current_time = time.time()
-        if current_time - self.last_cleanup < self.cleanup_interval:
-            return
+    """
+    In-memory storage for rate limiting
+    
+    Each (key, limit) pair is a token bucket holding
+    ``[tokens, last_refill_ns, window_ns]``: it refills at max_requests per
+    window and a request needs one token. Tokens are counted in units of
+    window_ns (one token == window_ns units), so a refill of elapsed_ns
+    nanoseconds adds exactly ``elapsed_ns * max_requests`` and the whole
+    check is O(1) integer arithmetic on time.monotonic_ns(), instead of
+    counting a deque of every request timestamp in the window.
+    """
+    
+    def __init__(self, max_keys: int = 100_000, idle_seconds: int = 86400):
+        # key -> limit string -> [tokens, last refill (monotonic ns), window ns],
+        # least recently used key first
+        self.buckets: "OrderedDict[str, Dict[str, list]]" = OrderedDict()
+        self.max_keys = max_keys
+        # After this long without requests every bucket (longest window: a
+        # day) is full again, so the key can be forgotten
+        self.idle_seconds = idle_seconds
+    
+    def _evict_keys(self, now_ns: int):
+        """
+        Drop idle keys and make room for one more within max_keys
         
-        cutoff_time = current_time - 3600  # Remove requests older than 1 hour
-        for key in list(self.requests.keys()):
-            requests = self.requests[key]
-            while requests and requests[0] < cutoff_time:
-                requests.popleft()
-            
-            if not requests:
-                del self.requests[key]
+        Called before a new key is inserted. Only the head of the LRU order
+        is inspected, so each call is amortized O(1) instead of a periodic
+        pass over every key.
+        """
+        buckets = self.buckets
+        idle_cutoff = now_ns - self.idle_seconds * 1_000_000_000
+        while buckets:
+            key_buckets = next(iter(buckets.values()))
+            if len(buckets) < self.max_keys and max(bucket[1] for bucket in key_buckets.values()) >= idle_cutoff:
+                break
+            buckets.popitem(last=False)
+    
+    def add_request(self, key: str, timestamp: float = None):
+        """Take one token from each of the key's buckets for an admitted request"""
+        for bucket in self.buckets.get(key, {}).values():
+            bucket[0] = max(0, bucket[0] - bucket[2])
+    
+    def is_allowed(self, key: str, limit: ParsedLimit) -> Tuple[bool, Dict]:
+        """Check if request is allowed based on limit (parsed at config time, see RateLimitConfig)"""
+        max_requests = limit.max_requests
+        window_ns = limit.window_ns
+        capacity = limit.capacity
         
-        self.last_cleanup = current_time
-    
-    def add_request(self, key: str, timestamp: float):
-        """Add a request timestamp"""
-        self._cleanup_old_requests()
-        self.requests[key].append(timestamp)
-    
-    def get_request_count(self, key: str, window_seconds: int) -> int:
-        """Get request count within time window"""
-        self._cleanup_old_requests()
-        current_time = time.time()
-        cutoff_time = current_time - window_seconds
+        now_ns = time.monotonic_ns()
         
-        requests = self.requests[key]
-        count = 0
-        for timestamp in reversed(requests):
-            if timestamp >= cutoff_time:
-                count += 1
-            else:
-                break
+        key_buckets = self.buckets.get(key)
+        if key_buckets is None:
+            self._evict_keys(now_ns)
+            key_buckets = self.buckets[key] = {}
+        else:
+            self.buckets.move_to_end(key)
+        bucket = key_buckets.get(limit.raw)
+        if bucket is None:
+            bucket = key_buckets[limit.raw] = [capacity, now_ns, window_ns]
+        else:
+            # Lazy refill for the time since the last check
+            bucket[0] = min(capacity, bucket[0] + (now_ns - bucket[1]) * max_requests)
+            bucket[1] = now_ns
+        tokens = bucket[0]
         
-        return count
+        is_allowed = tokens >= window_ns
+        
+        return is_allowed, {
+            "limit": limit.raw,
+            "current": max_requests - tokens // window_ns,
+            "max": max_requests,
+            "window": limit.unit,
+            # When the bucket is full again (wall clock, for the headers)
+            "reset_time": time.time() + (capacity - tokens) / (max_requests * 1_000_000_000)
+        }
+    
+    async def check_and_consume(self, keys: List[str], limits: Tuple[ParsedLimit, ...]) -> Tuple[bool, Dict]:
+        """
+        Check every limit for every key and, if all pass, take one token from each
+        
+        Nothing here awaits, so on the event loop the check and the spend can't
+        interleave with another request's.
+        """
+        return _check_and_consume_buckets(lambda key: self, keys, limits)
+    
+    def __len__(self) -> int:
+        return len(self.buckets)
+
+
+class ShardedRateLimitStorage:
+    """
+    Thread-safe in-memory storage for rate limiting
+    
+    RateLimitStorage needs no lock when it is only used from the event loop:
+    a check never awaits, so cooperative scheduling already serializes it.
+    This variant is for deployments that check limits from several threads.
+    Keys are spread over a power-of-two number of RateLimitStorage shards
+    (at least one per CPU), each with its own lock, so threads only contend
+    when their keys share a shard.
+    """
     
-    def is_allowed(self, key: str, limit: str) -> Tuple[bool, Dict]:
+    def __init__(self, shard_count: Optional[int] = None, max_keys: int = 100_000, idle_seconds: int = 86400):
+        # Round up to a power of two so the shard index is a bit mask
+        shard_count = shard_count or os.cpu_count() or 1
+        shard_count = 1 << (shard_count - 1).bit_length()
+        self.shard_mask = shard_count - 1
+        self.shards = [
+            RateLimitStorage(max_keys=max(1, max_keys // shard_count), idle_seconds=idle_seconds)
+            for _ in range(shard_count)
+        ]
+        self.locks = [threading.Lock() for _ in range(shard_count)]
+    
+    def add_request(self, key: str, timestamp: float = None):
+        """Take one token from each of the key's buckets for an admitted request"""
+        index = hash(key) & self.shard_mask
+        with self.locks[index]:
+            self.shards[index].add_request(key, timestamp)
+    
+    def is_allowed(self, key: str, limit: ParsedLimit) -> Tuple[bool, Dict]:
         """Check if request is allowed based on limit"""
-        limit_parts = limit.split("/")
-        if len(limit_parts) != 2:
-            return True, {}
+        index = hash(key) & self.shard_mask
+        with self.locks[index]:
+            return self.shards[index].is_allowed(key, limit)
+    
+    async def check_and_consume(self, keys: List[str], limits: Tuple[ParsedLimit, ...]) -> Tuple[bool, Dict]:
+        """
+        Check every limit for every key and, if all pass, take one token from each
         
-        try:
-            max_requests = int(limit_parts[0])
-            time_unit = limit_parts[1]
-            
-            # Convert time unit to seconds
-            time_multipliers = {
-                "second": 1,
-                "minute": 60,
-                "hour": 3600,
-                "day": 86400
-            }
-            
-            if time_unit not in time_multipliers:
-                return True, {}
-            
-            window_seconds = time_multipliers[time_unit]
-            current_count = self.get_request_count(key, window_seconds)
-            
-            is_allowed = current_count < max_requests
-            
-            return is_allowed, {
-                "limit": limit,
-                "current": current_count,
-                "max": max_requests,
-                "window": time_unit,
-                "reset_time": time.time() + window_seconds
-            }
+        The locks of every shard involved are held for the whole check and
+        spend, so two threads can't both take the last token. They are
+        acquired in shard order, so concurrent calls can't deadlock.
+        """
+        mask = self.shard_mask
+        indexes = sorted({hash(key) & mask for key in keys})
+        with ExitStack() as stack:
+            for index in indexes:
+                stack.enter_context(self.locks[index])
+            return _check_and_consume_buckets(lambda key: self.shards[hash(key) & mask], keys, limits)
+    
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+
+class RedisRateLimitStorage:
+    """
+    Redis storage for rate limiting, shared by every worker and instance
+    
+    Buckets are Redis hashes (``tok``, ``ts``) following the same token bucket
+    rules as RateLimitStorage. A request is decided by one Lua script that
+    refills, checks and takes a token from every (key, limit) bucket at once,
+    so each decision costs a single EVALSHA round trip however many limits
+    and keys apply. The script reads the Redis clock, so workers with skewed
+    clocks still agree on refills.
+    """
+    
+    # KEYS: one bucket per (key, limit), grouped by key in limit order.
+    # ARGV: limit count n, then max_requests and window_ms for each limit,
+    # then the index (into KEYS) of the bucket to report when allowed.
+    # Returns {allowed, bucket index, tokens before this request}.
+    CHECK_SCRIPT = """
+local n = tonumber(ARGV[1])
+local report = tonumber(ARGV[2 * n + 2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local tokens = {}
+for i = 1, #KEYS do
+    local j = (i - 1) % n
+    local max_requests = tonumber(ARGV[2 * j + 2])
+    local window = tonumber(ARGV[2 * j + 3])
+    local state = redis.call('HMGET', KEYS[i], 'tok', 'ts')
+    local t = tonumber(state[1])
+    if t == nil then
+        t = max_requests
+    else
+        t = math.min(max_requests, t + (now - tonumber(state[2])) * max_requests / window)
+    end
+    if t < 1 then
+        return {0, i, tostring(t)}
+    end
+    tokens[i] = t
+end
+for i = 1, #KEYS do
+    local j = (i - 1) % n
+    redis.call('HSET', KEYS[i], 'tok', tostring(tokens[i] - 1), 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], ARGV[2 * j + 3])
+end
+return {1, report, tostring(tokens[report])}
+"""
+    
+    def __init__(self, redis_url: str, key_prefix: str = "ratelimit:"):
+        self.key_prefix = key_prefix
+        self.client = redis.from_url(redis_url)
+        # register_script calls EVALSHA with the cached SHA1 and loads the
+        # script (SCRIPT LOAD) only when the server doesn't have it yet
+        self._check_script = self.client.register_script(self.CHECK_SCRIPT)
+    
+    async def check_and_consume(self, keys: List[str], limits: Tuple[ParsedLimit, ...]) -> Tuple[bool, Dict]:
+        """
+        Check every limit for every key and, if all pass, take one token from each
+        
+        Args:
+            keys: Rate limit subjects (client id, then user id if authenticated)
+            limits: Parsed limits applying to the request
             
-        except (ValueError, IndexError):
+        Returns:
+            Tuple[bool, Dict]: Whether the request is allowed, and the info of
+            the failing limit, or of the most restrictive limit of the first key
+        """
+        if not limits:
             return True, {}
+        
+        n = len(limits)
+        bucket_keys = [f"{self.key_prefix}{key}:{limit.raw}" for key in keys for limit in limits]
+        args = [n]
+        for limit in limits:
+            args += [limit.max_requests, limit.window_seconds * 1000]
+        # 1-based index of the first key's lowest-max limit
+        args.append(min(range(n), key=lambda i: limits[i].max_requests) + 1)
+        
+        allowed, index, tokens = await self._check_script(keys=bucket_keys, args=args)
+        limit = limits[(int(index) - 1) % n]
+        tokens = float(tokens)
+        max_requests = limit.max_requests
+        
+        return bool(allowed), {
+            "limit": limit.raw,
+            "current": max_requests - int(tokens),
+            "max": max_requests,
+            "window": limit.unit,
+            # When the bucket is full again
+            "reset_time": time.time() + (max_requests - tokens) * limit.window_seconds / max_requests
+        }
+    
+    def __len__(self) -> int:
+        # Keys live in Redis and expire there; none are tracked locally
+        return 0
 
 
 class RateLimitingMiddleware(BaseHTTPMiddleware):
@@ -164,68 +419,88 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
         self,
         app,
         config: Optional[RateLimitConfig] = None,
-        storage: Optional[RateLimitStorage] = None,
+        storage: Optional[Union[RateLimitStorage, ShardedRateLimitStorage, RedisRateLimitStorage]] = None,
     ):
         super().__init__(app)
         self.config = config or RateLimitConfig()
-        self.storage = storage or RateLimitStorage()
-        self.metrics = {
-            "total_requests": 0,
-            "rate_limited_requests": 0,
-            "endpoint_limits": defaultdict(int),
-            "client_limits": defaultdict(int),
-            "user_limits": defaultdict(int),
-        }
+        self.storage = storage or self._create_storage()
+        self.reset_metrics()
+    
+    def _create_storage(self) -> Union[RateLimitStorage, ShardedRateLimitStorage, RedisRateLimitStorage]:
+        """Create the storage selected by config.storage_backend"""
+        backend = self.config.storage_backend
+        if backend == "redis":
+            if redis is None:
+                logger.warning("Redis library not available, using in-memory rate limit storage. Install with: pip install redis")
+            elif not self.config.redis_url:
+                logger.warning("No redis_url configured, using in-memory rate limit storage")
+            else:
+                return RedisRateLimitStorage(self.config.redis_url)
+        elif backend == "sharded":
+            return ShardedRateLimitStorage()
+        return RateLimitStorage()
     
     async def dispatch(self, request: Request, call_next):
         """Process request through rate limiting middleware"""
-        self.metrics["total_requests"] += 1
+        self.total_requests += 1
         
         # Skip rate limiting for certain paths and methods
         if self._should_skip_request(request):
             return await call_next(request)
         
         try:
-            # Get client and user identifiers
-            client_id = self._get_client_identifier(request)
-            user_id = get_user_identifier(request)
+            # Get the identifiers whose limits apply
+            # X-Forwarded-For is parsed once and shared by both identifiers
+            client_ip = get_client_ip_from_scope(request.scope)
+            user_id = get_user_identifier(request, client_ip)
+            subjects = self._get_rate_limit_subjects(request, user_id, client_ip)
             
-            # Check rate limits
-            is_allowed, limit_info = await self._check_rate_limits(request, client_id, user_id)
+            # Check rate limits (and spend a token from each checked bucket if allowed)
+            is_allowed, limit_info = await self._check_rate_limits(request, subjects)
             
             if not is_allowed:
-                self.metrics["rate_limited_requests"] += 1
-                self.metrics["endpoint_limits"][request.url.path] += 1
-                self.metrics["client_limits"][client_id] += 1
+                client_id = self._get_client_identifier(request, client_ip)
+                self.rate_limited_requests += 1
+                self.endpoint_limits.add(request.url.path)
+                self.client_limits.add(client_id)
                 if user_id.startswith("user:"):
-                    self.metrics["user_limits"][user_id] += 1
+                    self.user_limits.add(user_id)
+                
+                path = request.url.path
+                method = request.method
                 
                 if self.config.enable_logging:
                     logger.warning(
-                        f"Rate limit exceeded for {client_id} (user: {user_id}) on {request.method} {request.url.path}",
+                        "Rate limit exceeded for %s (user: %s) on %s %s",
+                        client_id,
+                        user_id,
+                        method,
+                        path,
                         extra={
                             "client_id": client_id,
                             "user_id": user_id,
-                            "method": request.method,
-                            "path": request.url.path,
+                            "method": method,
+                            "path": path,
                             "limit_info": limit_info
                         }
                     )
                 
-                return JSONResponse(
+                # Only the per-request parts are encoded; the constant
+                # error object is spliced in from the pre-encoded prefix
+                return Response(
+                    content=(
+                        _RATE_LIMITED_PREFIX
+                        + orjson.dumps(limit_info)
+                        + b"},"
+                        + orjson.dumps({
+                            "path": path,
+                            "method": method,
+                            "user_id": user_id,
+                            "client_id": client_id
+                        })[1:]
+                    ),
                     status_code=429,
-                    content={
-                        "success": False,
-                        "error": {
-                            "code": "RATE_LIMIT_EXCEEDED",
-                            "message": "Rate limit exceeded. Please try again later.",
-                            "details": limit_info
-                        },
-                        "path": request.url.path,
-                        "method": request.method,
-                        "user_id": user_id,
-                        "client_id": client_id
-                    },
+                    media_type="application/json",
                     headers={
                         "X-RateLimit-Limit": str(limit_info.get("max", 0)),
                         "X-RateLimit-Remaining": str(max(0, limit_info.get("max", 0) - limit_info.get("current", 0))),
@@ -234,11 +509,6 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
                     }
                 )
             
-            # Add request to storage (both client and user if available)
-            self.storage.add_request(client_id, time.time())
-            if user_id.startswith("user:"):
-                self.storage.add_request(user_id, time.time())
-            
             # Continue with request
             response = await call_next(request)
             
@@ -257,89 +527,77 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
     
     def _should_skip_request(self, request: Request) -> bool:
         """Check if request should be skipped"""
-        # Skip by method
-        if request.method in self.config.skip_methods:
-            return True
+        scope = request.scope
+        config = self.config
+        return scope["method"] in config.skip_method_set or scope["path"].startswith(config.skip_prefixes)
+    
+    def _get_client_identifier(self, request: Request, client_ip: str) -> str:
+        """Get unique client identifier (computed once per request and kept on request.state)"""
+        client_id = getattr(request.state, "rate_limit_client_id", None)
+        if client_id is not None:
+            return client_id
         
-        # Skip by path
-        for skip_path in self.config.skip_paths:
-            if request.url.path.startswith(skip_path):
-                return True
+        client_id = client_ip
         
-        return False
-    
-    def _get_client_identifier(self, request: Request) -> str:
-        """Get unique client identifier"""
-        # Try to get real IP from headers (for reverse proxy setups)
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            client_ip = forwarded_for.split(",")[0].strip()
-        else:
-            client_ip = request.client.host if request.client else "unknown"
+        if self.config.client_id_include_user_agent:
+            # Add user agent for more granular identification. adler32 is a
+            # cheap C checksum and, unlike hash(), gives the same bucket in
+            # every worker process.
+            user_agent = get_scope_header(request.scope, b"user-agent") or "unknown"
+            client_id = f"{client_id}:{zlib.adler32(user_agent.encode()) % 10000}"
+        
+        request.state.rate_limit_client_id = client_id
+        return client_id
+    
+    def _get_rate_limit_subjects(self, request: Request, user_id: str, client_ip: str) -> Tuple[str, ...]:
+        """
+        Get the identifiers to check limits against
         
-        # Add user agent for more granular identification
-        user_agent = request.headers.get("User-Agent", "unknown")
+        Unauthenticated requests are limited by client. Authenticated ones
+        are limited by user only, unless check_client_limits_when_authenticated
+        is set or the path is auth-related (see client_limited_paths); the
+        user agent part of the client identifier is then never computed.
+        """
+        if not user_id.startswith("user:"):
+            return (self._get_client_identifier(request, client_ip),)
         
-        # Create composite key
-        return f"{client_ip}:{hash(user_agent) % 10000}"
+        config = self.config
+        if config.check_client_limits_when_authenticated or request.url.path in config.client_limited_paths:
+            return (self._get_client_identifier(request, client_ip), user_id)
+        return (user_id,)
     
-    async def _check_rate_limits(self, request: Request, client_id: str, user_id: str) -> Tuple[bool, Dict]:
+    async def _check_rate_limits(self, request: Request, subjects: Tuple[str, ...]) -> Tuple[bool, Dict]:
         """Check all applicable rate limits"""
         path = request.url.path
         
-        # Get limits for this endpoint
-        endpoint_limits = self.config.per_endpoint_limits.get(path, [])
-        all_limits = self.config.default_limits + endpoint_limits
-        
-        # Check client-based limits
-        for limit in all_limits:
-            is_allowed, limit_info = self.storage.is_allowed(client_id, limit)
-            if not is_allowed:
-                return False, limit_info
+        # Get limits for this endpoint (pre-merged with the defaults)
+        all_limits = self.config.path_limits.get(path, self.config.parsed_default_limits)
         
-        # Check user-based limits if user is authenticated
-        if user_id.startswith("user:"):
-            for limit in all_limits:
-                is_allowed, limit_info = self.storage.is_allowed(user_id, limit)
-                if not is_allowed:
-                    return False, limit_info
-        
-        # If all limits pass, return the most restrictive limit info
-        if all_limits:
-            # Get the most restrictive limit (lowest max requests)
-            most_restrictive = None
-            min_max = float('inf')
-            
-            for limit in all_limits:
-                is_allowed, limit_info = self.storage.is_allowed(client_id, limit)
-                if limit_info.get("max", float('inf')) < min_max:
-                    min_max = limit_info.get("max", float('inf'))
-                    most_restrictive = limit_info
-            
-            return True, most_restrictive or {}
-        
-        return True, {}
+        # Every storage checks and spends atomically (one Redis round trip,
+        # or one locked pass in memory)
+        return await self.storage.check_and_consume(list(subjects), all_limits)
     
     def get_metrics(self) -> Dict:
         """Get rate limiting metrics"""
         return {
-            "total_requests": self.metrics["total_requests"],
-            "rate_limited_requests": self.metrics["rate_limited_requests"],
+            "total_requests": self.total_requests,
+            "rate_limited_requests": self.rate_limited_requests,
             "rate_limit_percentage": (
-                self.metrics["rate_limited_requests"] / max(1, self.metrics["total_requests"]) * 100
+                self.rate_limited_requests / max(1, self.total_requests) * 100
             ),
-            "endpoint_limits": dict(self.metrics["endpoint_limits"]),
-            "client_limits": dict(self.metrics["client_limits"]),
-            "user_limits": dict(self.metrics["user_limits"]),
-            "active_clients": len(self.storage.requests),
+            "endpoint_limits": self.endpoint_limits.to_dict(),
+            "client_limits": self.client_limits.to_dict(),
+            "user_limits": self.user_limits.to_dict(),
+            "active_clients": len(self.storage),
         }
     
     def reset_metrics(self):
         """Reset rate limiting metrics"""
-        self.metrics = {
-            "total_requests": 0,
-            "rate_limited_requests": 0,
-            "endpoint_limits": defaultdict(int),
-            "client_limits": defaultdict(int),
-            "user_limits": defaultdict(int),
-        }
+        self.total_requests = 0
+        self.rate_limited_requests = 0
+        # Per-key denial counts are bounded: past max_keys only the heaviest
+        # offenders are kept, so an abuse wave from many IPs can't grow them
+        # without limit
+        self.endpoint_limits = TopKCounter(max_keys=1000)
+        self.client_limits = TopKCounter(max_keys=10_000)
+        self.user_limits = TopKCounter(max_keys=10_000)
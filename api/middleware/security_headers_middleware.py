@@ -12,35 +12,9 @@ from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 
-logger = logging.getLogger(__name__)
-
+from .utils import get_user_identifier
 
-def get_user_identifier(request: Request) -> str:
-    """Extract user identifier from request"""
-    # Try to get user ID from request state (set by auth middleware)
-    if hasattr(request.state, 'user_id') and request.state.user_id:
-        return f"user:{request.state.user_id}"
-    
-    # Try to get user ID from JWT token
-    auth_header = request.headers.get("Authorization")
-    if auth_header and auth_header.startswith("Bearer "):
-        try:
-            # This would need to be implemented with your JWT service
-            # token = auth_header.split(" ")[1]
-            # user_id = decode_jwt_token(token).get("user_id")
-            # if user_id:
-            #     return f"user:{user_id}"
-            pass
-        except Exception:
-            pass
-    
-    # Fallback to client IP
-    client_ip = request.client.host if request.client else "unknown"
-    forwarded_for = request.headers.get("X-Forwarded-For")
-    if forwarded_for:
-        client_ip = forwarded_for.split(",")[0].strip()
-    
-    return f"ip:{client_ip}"
+logger = logging.getLogger(__name__)
 
 
 @dataclass
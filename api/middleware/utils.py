@@ -4,6 +4,7 @@ MIDDLEWARE UTILITIES
 Shared utilities and common functionality for all middleware components
 """
 
+import heapq
 import logging
 from typing import Optional, Dict, Any, List
 from dataclasses import dataclass
@@ -15,7 +16,7 @@ from starlette.middleware.base import BaseHTTPMiddleware
 logger = logging.getLogger(__name__)
 
 
-def get_user_identifier(request: Request) -> str:
+def get_user_identifier(request: Request, client_ip: Optional[str] = None) -> str:
     """
     Extract user identifier from request - centralized implementation
     
@@ -26,13 +27,15 @@ def get_user_identifier(request: Request) -> str:
     
     Args:
         request: FastAPI request object
+        client_ip: Client IP if the caller already has it, to skip a second header lookup
         
     Returns:
         str: User identifier in format "user:{user_id}" or "ip:{client_ip}"
     """
     # Try to get user ID from request state (set by auth middleware)
-    if hasattr(request.state, 'user_id') and request.state.user_id:
-        return f"user:{request.state.user_id}"
+    user_id = getattr(request.state, 'user_id', None)
+    if user_id:
+        return f"user:{user_id}"
     
     # Try to get user ID from JWT token
     auth_header = request.headers.get("Authorization")
@@ -48,7 +51,8 @@ def get_user_identifier(request: Request) -> str:
             pass
     
     # Fallback to client IP
-    client_ip = get_client_ip(request)
+    if client_ip is None:
+        client_ip = get_client_ip(request)
     return f"ip:{client_ip}"
 
 
@@ -65,12 +69,67 @@ def get_client_ip(request: Request) -> str:
     # Try to get real IP from headers (for reverse proxy setups)
     forwarded_for = request.headers.get("X-Forwarded-For")
     if forwarded_for:
-        return forwarded_for.split(",")[0].strip()
+        # partition() takes the first hop without building a list of all of them
+        return forwarded_for.partition(",")[0].strip()
     
     # Fallback to direct client IP
     return request.client.host if request.client else "unknown"
 
 
+def get_scope_header(scope: Dict[str, Any], name: bytes) -> Optional[str]:
+    """
+    Get a header value straight from the raw ASGI header pairs
+    
+    For pure ASGI middleware, which has no Request object to ask.
+    
+    Args:
+        scope: ASGI connection scope
+        name: Lowercase header name as bytes (e.g. b"x-forwarded-for")
+        
+    Returns:
+        Optional[str]: Header value, or None if absent
+    """
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def get_client_ip_from_scope(scope: Dict[str, Any]) -> str:
+    """
+    Extract client IP address from an ASGI scope (same rules as get_client_ip)
+    
+    Args:
+        scope: ASGI connection scope
+        
+    Returns:
+        str: Client IP address
+    """
+    forwarded_for = get_scope_header(scope, b"x-forwarded-for")
+    if forwarded_for:
+        return forwarded_for.partition(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def get_user_identifier_from_scope(scope: Dict[str, Any], client_ip: str) -> str:
+    """
+    Extract user identifier from an ASGI scope (same rules as get_user_identifier)
+    
+    Args:
+        scope: ASGI connection scope
+        client_ip: Client IP, used when no user is set on the request state
+        
+    Returns:
+        str: User identifier in format "user:{user_id}" or "ip:{client_ip}"
+    """
+    state = scope.get("state")
+    user_id = state.get("user_id") if state else None
+    if user_id:
+        return f"user:{user_id}"
+    return f"ip:{client_ip}"
+
+
 def get_client_identifier(request: Request) -> str:
     """
     Get unique client identifier combining IP and user agent
@@ -137,13 +196,16 @@ class BaseMiddleware(BaseHTTPMiddleware):
         Returns:
             bool: True if request should be skipped
         """
+        scope = request.scope
+        
         # Skip by method
-        if request.method in self.config.skip_methods:
+        if scope["method"] in self.config.skip_methods:
             return True
         
-        # Skip by path
+        # Skip by path (raw scope path, avoiding a URL object per request)
+        path = scope["path"]
         for skip_path in self.config.skip_paths:
-            if request.url.path.startswith(skip_path):
+            if path.startswith(skip_path):
                 return True
         
         return False
@@ -161,11 +223,12 @@ class BaseMiddleware(BaseHTTPMiddleware):
         if not self.config.enable_logging:
             return
         
+        client_ip = get_client_ip(request)
         log_data = {
             "method": request.method,
             "path": request.url.path,
-            "client_ip": get_client_ip(request),
-            "user_id": get_user_identifier(request),
+            "client_ip": client_ip,
+            "user_id": get_user_identifier(request, client_ip),
             "user_agent": request.headers.get("User-Agent", "unknown"),
             **extra_data
         }
@@ -187,6 +250,41 @@ class BaseMiddleware(BaseHTTPMiddleware):
         }
 
 
+class TopKCounter:
+    """
+    Counter that keeps at most ``max_keys`` keys
+
+    When a new key would exceed the limit, the counter is pruned to the
+    ``max_keys // 2`` highest counts, so frequent keys (heavy hitters) are
+    kept while one-off keys (e.g. scanning IPs) are dropped. Memory stays
+    bounded and pruning is amortized over the inserts between prunes.
+    """
+    
+    def __init__(self, max_keys: int = 1000):
+        self.max_keys = max_keys
+        self.counts: Dict[Any, int] = {}
+    
+    def add(self, key: Any, amount: int = 1):
+        counts = self.counts
+        if key in counts:
+            counts[key] += amount
+            return
+        if len(counts) >= self.max_keys:
+            keep = heapq.nlargest(self.max_keys // 2, counts.items(), key=lambda item: item[1])
+            self.counts = counts = dict(keep)
+        counts[key] = amount
+    
+    def most_common(self, n: int) -> Dict[Any, int]:
+        """Get the ``n`` highest counts, highest first"""
+        return dict(heapq.nlargest(n, self.counts.items(), key=lambda item: item[1]))
+    
+    def to_dict(self) -> Dict[Any, int]:
+        return dict(self.counts)
+    
+    def __len__(self) -> int:
+        return len(self.counts)
+
+
 class MiddlewareMetrics:
     """Centralized metrics collection for middleware"""
     
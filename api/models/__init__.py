@@ -3,6 +3,7 @@ Database models for clipizy Backend
 """
 
 from .audio import Audio
+from .config_override import ConfigOverride
 from .export import Export
 from .image import Image
 from .job import Job
@@ -45,6 +46,7 @@ __all__ = [
     "Audio",
     "Job",
     "UserSettings",
+    "ConfigOverride",
     # RunPod
     "RunPodUser",
     "RunPodPod",
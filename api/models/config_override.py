@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from sqlalchemy import JSON, Column, DateTime, String
+
+from api.db import Base
+
+
+class ConfigOverride(Base):
+    """Runtime configuration override, keyed by dotted config path (e.g. 'business.credits_rate')"""
+
+    __tablename__ = "config_overrides"
+
+    key = Column(String, primary_key=True)
+    value = Column(JSON, nullable=False)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -243,10 +243,17 @@ async def health_metrics(request: Request):
             metrics = {}
             health_status = {"status": "unknown"}
         
+        # Pool metrics are maintained by pool event listeners, so this is a cheap read
+        try:
+            database_pool = get_pool_status()
+        except RuntimeError:
+            database_pool = {}
+        
         return {
             "timestamp": datetime.utcnow().isoformat(),
             "health_status": health_status,
             "application_metrics": metrics,
+            "database_pool": database_pool,
             "system_info": {
                 "version": health_checker.version,
                 "uptime_seconds": time.time() - health_checker.start_time,
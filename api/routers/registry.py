@@ -21,6 +21,8 @@ class RouterRegistry:
         self.registered_base_routers: Dict[str, BaseRouter] = {}
         self.router_configs: Dict[str, RouterConfig] = {}
         self.architecture = get_router_architecture()
+        # Summary of the current registrations, rebuilt after the next registration
+        self._summary_cache: Optional[Dict[str, Any]] = None
     
     def register_router(self, name: str, router: APIRouter, config: Optional[RouterConfig] = None) -> None:
         """
@@ -45,6 +47,7 @@ class RouterRegistry:
         
         self.registered_routers[name] = router
         self.router_configs[name] = config
+        self._summary_cache = None
         
         logger.info(f"Registered router '{name}' with prefix '{config.prefix}'")
     
@@ -69,6 +72,7 @@ class RouterRegistry:
         self.registered_base_routers[name] = base_router
         self.registered_routers[name] = base_router.router
         self.router_configs[name] = config
+        self._summary_cache = None
         
         logger.info(f"Registered base router '{name}' with prefix '{config.prefix}'")
     
@@ -158,7 +162,18 @@ class RouterRegistry:
         return issues
     
     def get_registry_summary(self) -> Dict[str, Any]:
-        """Get summary of registered routers"""
+        """
+        Get summary of registered routers
+        
+        The summary is cached until the next registration; callers share the
+        returned dict and must not mutate it.
+        """
+        if self._summary_cache is None:
+            self._summary_cache = self._build_registry_summary()
+        return self._summary_cache
+    
+    def _build_registry_summary(self) -> Dict[str, Any]:
+        """Build the summary of registered routers"""
         return {
             "total_registered": len(self.registered_routers),
             "total_configs": len(self.router_configs),
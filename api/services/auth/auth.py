@@ -3,27 +3,35 @@ Unified Authentication Service
 Complete authentication system in a single file
 """
 
+import asyncio
 import json
 import logging
 import os
+import threading
+import time
 import uuid
+import weakref
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import httpx
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session, make_transient_to_detached, raiseload
 
 from api.config.logging import get_auth_logger
-import os
 from api.models import User
 from api.models.pricing import CreditsTransactionType
 from api.schemas import UserCreate
 from api.services.business.pricing_service import credits_service
 from api.services.database import get_db
+from api.db import AsyncSessionLocal, get_sessionmaker, has_async_driver
 
 logger = get_auth_logger()
 
@@ -35,6 +43,14 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 30
+_ALGORITHMS = [ALGORITHM]
+
+# Verified token -> payload cache; the same token is typically verified by the
+# auth middleware and again by route dependencies within one request
+TOKEN_VERIFY_CACHE_TTL = float(os.getenv("TOKEN_VERIFY_CACHE_TTL", "60"))
+TOKEN_VERIFY_CACHE_MAXSIZE = int(os.getenv("TOKEN_VERIFY_CACHE_MAXSIZE", "4096"))
+_verified_tokens: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_verified_tokens_lock = threading.Lock()
 
 # Security scheme for dependency injection
 # We'll create it dynamically based on TEST_MODE
@@ -70,6 +86,127 @@ def create_user_storage_structure(user_id: str) -> bool:
         return False
 
 
+def user_column_snapshot(user: User) -> Dict[str, Any]:
+    """Get the loaded column values of a user (safe to share across requests)"""
+    loaded = sa_inspect(user).dict
+    return {key: loaded[key] for key in _USER_COLUMN_KEYS if key in loaded}
+
+
+def detached_user_from_snapshot(columns: Dict[str, Any]) -> User:
+    """Build a fresh detached User from a column snapshot"""
+    user = User(**columns)
+    make_transient_to_detached(user)
+    return user
+
+
+_USER_COLUMN_KEYS = tuple(sa_inspect(User).column_attrs.keys())
+
+
+# Base of the batched user lookup, built once. Only the user's columns are
+# loaded: its relationships are one-to-many collections the auth path never
+# needs, so they raise instead of issuing hidden queries. The IN list is an
+# expanding bound parameter, so SQLAlchemy's compiled cache serves every
+# batch size with one cached compilation.
+_USERS_BY_ID_BASE = select(User).options(raiseload("*"))
+
+
+def _users_by_id_query(user_ids: List[str]):
+    """SELECT of the given users' columns"""
+    return _USERS_BY_ID_BASE.where(User.id.in_(user_ids))
+
+
+def _load_user_snapshots_sync(user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Sync counterpart of the batched lookup, for databases without an async driver"""
+    db = get_sessionmaker()()
+    try:
+        result = db.execute(_users_by_id_query(user_ids))
+        return {str(user.id): user_column_snapshot(user) for user in result.scalars()}
+    finally:
+        db.close()
+
+
+# Whether DATABASE_URL has an async driver, decided once per process
+_async_db_available: Optional[bool] = None
+
+
+def _use_async_db() -> bool:
+    global _async_db_available
+    if _async_db_available is None:
+        _async_db_available = has_async_driver()
+        if not _async_db_available:
+            logger.info("No async driver for DATABASE_URL; auth user lookups use the sync engine in a threadpool")
+    return _async_db_available
+
+
+def _normalize_user_id(user_id: str) -> Optional[str]:
+    """Canonical string form of a user id (matching str(user.id)), or None if it is not a UUID"""
+    try:
+        return str(uuid.UUID(str(user_id)))
+    except ValueError:
+        return None
+
+
+class _UserBatchLoader:
+    """
+    Coalesce concurrent user-by-id lookups into one query per event loop tick
+    
+    Lookups requested during the same tick are collected and resolved by a
+    single ``WHERE id IN (...)`` SELECT; concurrent lookups for the same id
+    share one row. Each caller receives column snapshots, never a shared ORM
+    instance.
+    """
+    
+    def __init__(self):
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._scheduled = False
+        # The loop only keeps weak references to tasks; hold running
+        # batches so they are not garbage-collected mid-query
+        self._tasks: Set[asyncio.Task] = set()
+    
+    def load(self, user_id: str) -> "asyncio.Future":
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(user_id, []).append(future)
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._dispatch, loop)
+        return future
+    
+    def _dispatch(self, loop: asyncio.AbstractEventLoop):
+        batch, self._pending = self._pending, {}
+        self._scheduled = False
+        task = loop.create_task(self._resolve(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _resolve(self, batch: Dict[str, List[asyncio.Future]]):
+        try:
+            if _use_async_db():
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(_users_by_id_query(list(batch)))
+                    users = {str(user.id): user_column_snapshot(user) for user in result.scalars()}
+            else:
+                users = await run_in_threadpool(_load_user_snapshots_sync, list(batch))
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        
+        for user_id, futures in batch.items():
+            columns = users.get(user_id)
+            for future in futures:
+                if not future.done():
+                    future.set_result(columns)
+
+
+# One loader per event loop (futures cannot cross loops)
+_user_batch_loaders: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _UserBatchLoader]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
 # CORE AUTHENTICATION CLASS
 class AuthService:
     def __init__(self):
@@ -157,11 +294,26 @@ class AuthService:
             return None
 
     def verify_token(self, token: str) -> Optional[dict]:
-        """Verify and decode a JWT token"""
+        """
+        Verify and decode a JWT token
+        
+        Successful verifications are cached until the cache TTL or the token's
+        own expiry, whichever comes first; callers get a copy of the payload.
+        """
+        now = time.monotonic()
+        with _verified_tokens_lock:
+            entry = _verified_tokens.get(token)
+            if entry is not None:
+                if now < entry[0]:
+                    _verified_tokens.move_to_end(token)
+                    return dict(entry[1])
+                del _verified_tokens[token]
+        
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            logger.debug(f"Token verified for user: {payload.get('sub', 'unknown')}")
-            return payload
+            payload = jwt.decode(token, SECRET_KEY, algorithms=_ALGORITHMS)
+            logger.debug("Token verified for user: %s", payload.get("sub", "unknown"))
+            self._cache_verified_token(token, payload, now)
+            return dict(payload)
         except JWTError as e:
             logger.warning(f"Token verification failed: {str(e)}")
             return None
@@ -169,6 +321,21 @@ class AuthService:
             logger.error(f"Token verification error: {str(e)}")
             return None
 
+    @staticmethod
+    def _cache_verified_token(token: str, payload: Dict[str, Any], now: float):
+        """Remember a verified payload, never past the token's exp claim"""
+        ttl = TOKEN_VERIFY_CACHE_TTL
+        token_exp = payload.get("exp")
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        
+        with _verified_tokens_lock:
+            while len(_verified_tokens) >= TOKEN_VERIFY_CACHE_MAXSIZE:
+                _verified_tokens.popitem(last=False)
+            _verified_tokens[token] = (now + ttl, payload)
+
     def get_user_by_id(self, db: Session, user_id: str) -> Optional[User]:
         """Get user by ID"""
         try:
@@ -182,6 +349,34 @@ class AuthService:
             logger.error(f"Error getting user by ID {user_id}: {str(e)}")
             return None
 
+    async def get_user_by_id_batched(self, user_id: str) -> Optional[User]:
+        """
+        Get user by ID, batching concurrent lookups into a single query
+        
+        Returns a fresh detached User per caller, or None if not found.
+        """
+        loop = asyncio.get_running_loop()
+        loader = _user_batch_loaders.get(loop)
+        if loader is None:
+            loader = _user_batch_loaders[loop] = _UserBatchLoader()
+        
+        # Malformed ids never reach the batch, where they would fail the shared query
+        normalized_id = _normalize_user_id(user_id)
+        if normalized_id is None:
+            logger.warning(f"Invalid user ID: {user_id}")
+            return None
+        
+        try:
+            columns = await loader.load(normalized_id)
+        except Exception as e:
+            logger.error(f"Error getting user by ID {user_id}: {str(e)}")
+            return None
+        
+        if columns is None:
+            logger.warning(f"User not found with ID: {user_id}")
+            return None
+        return detached_user_from_snapshot(columns)
+
     def update_user_last_login(self, db: Session, user_id: str) -> bool:
         """Update user's last login timestamp"""
         try:
@@ -809,10 +1004,16 @@ class AuthDependencies:
     @staticmethod
     def get_current_user(
         credentials: Optional[HTTPAuthorizationCredentials] = Depends(security), 
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_db),
+        request: Optional[Request] = None
     ) -> User:
         """
-        Get the current authenticated user from JWT token with full database validation
+        Get the current authenticated user from JWT token
+        
+        The user is always loaded from the database through the route's
+        session (by primary key when AuthMiddleware already resolved it), so
+        is_active, is_admin and balances reflect the current row even though
+        the middleware caches users for AUTH_USER_CACHE_TTL seconds.
         
         Returns:
             User: The authenticated user object
@@ -854,7 +1055,10 @@ class AuthDependencies:
                     headers={"WWW-Authenticate": "Bearer"},
                 )
             
-            user = auth_service.get_user_by_id(db, user_id)
+            # Reuse the user AuthMiddleware already loaded for this request
+            user = AuthDependencies._get_request_user(request, user_id, db)
+            if user is None:
+                user = auth_service.get_user_by_id(db, user_id)
             if not user:
                 logger.warning(f"User not found for ID: {user_id}")
                 raise HTTPException(
@@ -947,18 +1151,22 @@ class AuthDependencies:
     @staticmethod
     def get_admin_user(
         credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_db),
+        request: Optional[Request] = None
     ) -> User:
         """
         Get current user and verify admin privileges
         
+        The admin flag is read from the freshly loaded user returned by
+        get_current_user, so a demoted admin loses access immediately.
+        
         Returns:
             User: The authenticated admin user
             
         Raises:
             HTTPException: 401 if not authenticated, 403 if not admin
         """
-        user = AuthDependencies.get_current_user(credentials, db)
+        user = AuthDependencies.get_current_user(credentials, db, request)
         
         # In test mode, allow admin access for test user
         if AuthDependencies._is_test_mode():
@@ -977,6 +1185,28 @@ class AuthDependencies:
         logger.debug(f"Admin user authenticated: {user.email}")
         return user
     
+    @staticmethod
+    def _get_request_user(request: Optional[Request], user_id: str, db: Session) -> Optional[User]:
+        """
+        Load the user AuthMiddleware resolved for this request, if it matches the token
+        
+        The middleware's instance may come from its token cache (up to
+        AUTH_USER_CACHE_TTL old), so it is never put into the route's session:
+        routes read and update columns such as credits_balance through that
+        session, and a stale identity-mapped copy would make them compute from
+        an old balance (lost updates). Its primary key is used for a fresh
+        Session.get() instead, skipping the id parsing and filter query of
+        get_user_by_id.
+        """
+        if request is None:
+            return None
+        
+        user = getattr(request.state, "user", None)
+        if user is None or str(user.id) != str(user_id):
+            return None
+        
+        return db.get(User, user.id)
+    
     @staticmethod
     def _is_test_mode() -> bool:
         """Check if test mode is enabled"""
@@ -1006,11 +1236,12 @@ class AuthDependencies:
 
 # Convenience functions for backward compatibility and ease of use
 def get_current_user(
+    request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Session = Depends(get_db)
 ) -> User:
-    """Get the current authenticated user (full validation)"""
-    return AuthDependencies.get_current_user(credentials, db)
+    """Get the current authenticated user (loaded from the database)"""
+    return AuthDependencies.get_current_user(credentials, db, request)
 
 
 def get_current_user_simple(
@@ -1021,11 +1252,12 @@ def get_current_user_simple(
 
 
 def get_admin_user(
+    request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Session = Depends(get_db)
 ) -> User:
     """Get current user with admin privileges"""
-    return AuthDependencies.get_admin_user(credentials, db)
+    return AuthDependencies.get_admin_user(credentials, db, request)
 
 
 # USER MANAGEMENT SERVICE
@@ -5,6 +5,7 @@ Provides optimized connection pooling and database management for production
 
 import logging
 import os
+import time
 from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from enum import Enum
@@ -92,6 +93,14 @@ class DatabaseConnectionManager:
         self._connection_count = 0
         self._active_connections = 0
         
+        # Pool metrics maintained by the pool event listeners
+        self._total_checkouts = 0
+        self._total_checkout_seconds = 0.0
+        self._max_checkout_seconds = 0.0
+        self._long_checkouts = 0
+        # id(connection record) -> checkout start time, for connections currently checked out
+        self._checkout_started: Dict[int, float] = {}
+        
         # Initialize connection pool
         self._create_engine()
         self._setup_monitoring()
@@ -172,27 +181,44 @@ class DatabaseConnectionManager:
         if not self.config.enable_monitoring:
             return
         
+        # Connections held longer than this are reported as possible leaks
+        pool_timeout = self.config.pool_config.pool_timeout
+        hold_warning_seconds = pool_timeout * 0.8
+        checkout_started = self._checkout_started
+        
         # Monitor connection events
         @event.listens_for(self.engine, "connect")
         def receive_connect(dbapi_connection, connection_record):
             self._connection_count += 1
-            self._active_connections += 1
-            logger.debug(f"Database connection established. Total: {self._connection_count}, Active: {self._active_connections}")
+            logger.debug("Database connection established. Total: %s", self._connection_count)
         
         @event.listens_for(self.engine, "checkout")
         def receive_checkout(dbapi_connection, connection_record, connection_proxy):
-            self._active_connections += 1
-            logger.debug(f"Connection checked out. Active: {self._active_connections}")
+            self._total_checkouts += 1
+            checkout_started[id(connection_record)] = time.perf_counter()
+            self._active_connections = len(checkout_started)
         
         @event.listens_for(self.engine, "checkin")
         def receive_checkin(dbapi_connection, connection_record):
-            self._active_connections -= 1
-            logger.debug(f"Connection checked in. Active: {self._active_connections}")
+            started = checkout_started.pop(id(connection_record), None)
+            self._active_connections = len(checkout_started)
+            if started is None:
+                return
+            
+            held = time.perf_counter() - started
+            self._total_checkout_seconds += held
+            if held > self._max_checkout_seconds:
+                self._max_checkout_seconds = held
+            if held > hold_warning_seconds:
+                self._long_checkouts += 1
+                logger.warning(
+                    "Database connection held for %.2fs (pool_timeout=%ss); possible session leak",
+                    held, pool_timeout
+                )
         
         @event.listens_for(self.engine, "close")
         def receive_close(dbapi_connection, connection_record):
-            self._active_connections -= 1
-            logger.debug(f"Database connection closed. Active: {self._active_connections}")
+            logger.debug("Database connection closed")
         
         # Monitor pool events
         @event.listens_for(self.engine, "invalidate")
@@ -233,10 +259,21 @@ class DatabaseConnectionManager:
     def get_pool_status(self) -> Dict[str, Any]:
         """Get current pool status"""
         pool_info = self._get_pool_info()
+        
+        # Age of the longest-held connection still checked out (leak indicator)
+        now = time.perf_counter()
+        oldest_checkout = max((now - started for started in list(self._checkout_started.values())), default=0.0)
+        completed_checkouts = max(self._total_checkouts - self._active_connections, 1)
+        
         return {
             "pool_info": pool_info,
             "connection_count": self._connection_count,
             "active_connections": self._active_connections,
+            "total_checkouts": self._total_checkouts,
+            "avg_checkout_seconds": self._total_checkout_seconds / completed_checkouts,
+            "max_checkout_seconds": self._max_checkout_seconds,
+            "oldest_checkout_seconds": oldest_checkout,
+            "long_checkouts": self._long_checkouts,
             "database_type": self.config.database_type.value,
             "is_production": self.config.is_production,
         }
@@ -403,6 +440,17 @@ def initialize_connection_manager(database_url: str, environment: str = "develop
     return _connection_manager
 
 
+def _reset_pool_after_fork():
+    """Give a forked worker its own connection pool"""
+    # close=False drops the inherited pool without closing the parent's sockets
+    if _connection_manager is not None and _connection_manager.engine is not None:
+        _connection_manager.engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+
 def get_db_session() -> Session:
     """Get a database session from the global connection manager"""
     return get_connection_manager().get_session()
@@ -5,6 +5,7 @@ Moved from /api/data/database/ for complete data folder elimination
 
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
 
 # Removed config import to avoid circular dependency
@@ -45,12 +46,17 @@ def get_optimized_db():
 
 def create_tables():
     """Create all database tables"""
-    Base.metadata.create_all(bind=engine)
+    # Models are declared on api.db.Base (this package's Base has no tables);
+    # shares api.db's once-per-process guard
+    from api.db import ensure_model_tables
+    ensure_model_tables(bind=engine)
 
 
 def drop_tables():
     """Drop all database tables"""
+    from api.db import mark_model_tables_dropped
     Base.metadata.drop_all(bind=engine)
+    mark_model_tables_dropped()
 
 
 def get_database_url():
@@ -66,10 +72,11 @@ def get_connection_pool_status():
 def test_database_connection():
     """Test database connection"""
     try:
-        db = next(get_db())
-        db.execute("SELECT 1")
+        with engine.connect() as connection:
+            # Driver-level SQL skips statement compilation
+            connection.exec_driver_sql("SELECT 1").scalar()
         return True
-    except Exception as e:
+    except SQLAlchemyError as e:
         print(f"Database connection test failed: {e}")
         return False
 
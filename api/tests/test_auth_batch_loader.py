@@ -0,0 +1,151 @@
+"""
+Batched user lookup tests
+
+AuthService.get_user_by_id_batched on a fake async session that records
+every query.
+"""
+
+import asyncio
+import uuid
+
+import pytest
+
+from api.models import User
+from api.services.auth import auth
+from api.services.auth.auth import auth_service
+
+
+class FakeResult:
+    def __init__(self, users):
+        self._users = users
+    
+    def scalars(self):
+        return iter(self._users)
+
+
+class FakeAsyncSession:
+    """Answers SELECTs from a fixed set of users and records each one"""
+    
+    def __init__(self, users, queries, error=None):
+        self._users = users
+        self._queries = queries
+        self._error = error
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return False
+    
+    async def execute(self, statement):
+        self._queries.append(statement)
+        if self._error is not None:
+            raise self._error
+        # Let other tasks run, as a real round trip would
+        await asyncio.sleep(0)
+        return FakeResult(self._users)
+
+
+def make_user(email: str) -> User:
+    return User(id=uuid.uuid4(), email=email, is_active=True, is_admin=False, credits_balance=60)
+
+
+def queried_ids(statement):
+    """The ids in the statement's expanding IN parameter"""
+    (ids,) = statement.compile().params.values()
+    return set(ids)
+
+
+@pytest.fixture
+def queries():
+    return []
+
+
+@pytest.fixture
+def use_session(monkeypatch, queries):
+    monkeypatch.setattr(auth, "_use_async_db", lambda: True)
+    
+    def use(users, error=None):
+        monkeypatch.setattr(auth, "AsyncSessionLocal", lambda: FakeAsyncSession(users, queries, error))
+    
+    return use
+
+
+def test_concurrent_lookups_share_one_select(use_session, queries):
+    alice = make_user("alice@example.com")
+    bob = make_user("bob@example.com")
+    missing_id = str(uuid.uuid4())
+    use_session([alice, bob])
+    
+    async def lookups():
+        return await asyncio.gather(
+            auth_service.get_user_by_id_batched(str(alice.id)),
+            auth_service.get_user_by_id_batched(str(bob.id)),
+            auth_service.get_user_by_id_batched(str(alice.id)),
+            auth_service.get_user_by_id_batched(missing_id),
+        )
+    
+    first_alice, found_bob, second_alice, missing = asyncio.run(lookups())
+    
+    assert len(queries) == 1
+    assert queried_ids(queries[0]) == {str(alice.id), str(bob.id), missing_id}
+    
+    assert first_alice.email == second_alice.email == "alice@example.com"
+    assert found_bob.email == "bob@example.com"
+    assert missing is None
+    
+    # Each caller gets its own detached instance, never the session's row
+    assert first_alice is not second_alice
+    assert first_alice is not alice
+    assert auth.sa_inspect(first_alice).detached
+    assert auth.sa_inspect(second_alice).detached
+    first_alice.credits_balance = 0
+    assert second_alice.credits_balance == 60
+
+
+def test_lookups_in_separate_ticks_issue_separate_selects(use_session, queries):
+    alice = make_user("alice@example.com")
+    use_session([alice])
+    
+    async def lookups():
+        first = await auth_service.get_user_by_id_batched(str(alice.id))
+        second = await auth_service.get_user_by_id_batched(str(alice.id))
+        return first, second
+    
+    first, second = asyncio.run(lookups())
+    
+    assert len(queries) == 2
+    assert first.email == second.email == "alice@example.com"
+
+
+def test_failed_select_rejects_every_waiting_lookup(use_session, queries):
+    alice = make_user("alice@example.com")
+    bob = make_user("bob@example.com")
+    use_session([alice, bob], error=RuntimeError("connection lost"))
+    
+    async def lookups():
+        return await asyncio.gather(
+            auth_service.get_user_by_id_batched(str(alice.id)),
+            auth_service.get_user_by_id_batched(str(bob.id)),
+            auth_service.get_user_by_id_batched(str(alice.id)),
+        )
+    
+    assert asyncio.run(lookups()) == [None, None, None]
+    assert len(queries) == 1
+
+
+def test_invalid_id_is_not_batched(use_session, queries):
+    alice = make_user("alice@example.com")
+    use_session([alice])
+    
+    async def lookups():
+        return await asyncio.gather(
+            auth_service.get_user_by_id_batched("not-a-uuid"),
+            auth_service.get_user_by_id_batched(str(alice.id)),
+        )
+    
+    invalid, found = asyncio.run(lookups())
+    
+    assert invalid is None
+    assert found.email == "alice@example.com"
+    assert queried_ids(queries[0]) == {str(alice.id)}
@@ -0,0 +1,163 @@
+"""
+Rate limiting storage tests
+
+Token bucket refill, the 429 info and key eviction, on a fake clock.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from api.middleware import rate_limiting_middleware as rl
+from api.middleware.rate_limiting_middleware import (
+    RateLimitStorage,
+    ShardedRateLimitStorage,
+    _parse_limit,
+)
+
+
+class FakeClock:
+    """Monotonic and wall clocks that only move when told to"""
+    
+    def __init__(self):
+        self.ns = 1_000_000_000_000
+        self.wall = 1_700_000_000.0
+    
+    def monotonic_ns(self) -> int:
+        return self.ns
+    
+    def time(self) -> float:
+        return self.wall
+    
+    def advance(self, seconds: float):
+        self.ns += int(seconds * 1_000_000_000)
+        self.wall += seconds
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rl.time, "monotonic_ns", clock.monotonic_ns)
+    monkeypatch.setattr(rl.time, "time", clock.time)
+    return clock
+
+
+def test_full_bucket_allows_max_requests_then_denies(clock):
+    storage = RateLimitStorage()
+    limits = (_parse_limit("3/minute"),)
+    
+    for _ in range(3):
+        allowed, _ = run(storage.check_and_consume(["client"], limits))
+        assert allowed
+    
+    allowed, info = run(storage.check_and_consume(["client"], limits))
+    assert not allowed
+    assert info["limit"] == "3/minute"
+    assert info["max"] == 3
+    assert info["window"] == "minute"
+
+
+def test_partial_refill_after_half_a_window(clock):
+    storage = RateLimitStorage()
+    limits = (_parse_limit("10/second"),)
+    
+    for _ in range(10):
+        assert run(storage.check_and_consume(["client"], limits))[0]
+    assert not run(storage.check_and_consume(["client"], limits))[0]
+    
+    clock.advance(0.5)
+    for _ in range(5):
+        assert run(storage.check_and_consume(["client"], limits))[0]
+    assert not run(storage.check_and_consume(["client"], limits))[0]
+
+
+def test_denied_info_reports_current_and_reset_time(clock):
+    storage = RateLimitStorage()
+    limits = (_parse_limit("2/minute"),)
+    
+    for _ in range(2):
+        assert run(storage.check_and_consume(["client"], limits))[0]
+    
+    allowed, info = run(storage.check_and_consume(["client"], limits))
+    assert not allowed
+    assert info["current"] == 2
+    assert info["reset_time"] == pytest.approx(clock.wall + 60)
+    
+    # Half a window later one token is back and the bucket is full in 30s
+    clock.advance(30)
+    allowed, info = storage.is_allowed("client", limits[0])
+    assert allowed
+    assert info["current"] == 1
+    assert info["reset_time"] == pytest.approx(clock.wall + 30)
+
+
+def test_denied_key_does_not_spend_the_other_keys(clock):
+    storage = RateLimitStorage()
+    limits = (_parse_limit("1/minute"),)
+    
+    assert run(storage.check_and_consume(["user"], limits))[0]
+    assert not run(storage.check_and_consume(["client", "user"], limits))[0]
+    
+    # The client's token was not taken by the denied request
+    assert run(storage.check_and_consume(["client"], limits))[0]
+    assert not run(storage.check_and_consume(["client"], limits))[0]
+
+
+def test_most_restrictive_limit_is_reported_when_allowed(clock):
+    storage = RateLimitStorage()
+    limits = (_parse_limit("100/minute"), _parse_limit("5/second"))
+    
+    allowed, info = run(storage.check_and_consume(["client"], limits))
+    assert allowed
+    assert info["limit"] == "5/second"
+
+
+def test_evicts_least_recently_used_key_past_max_keys(clock):
+    storage = RateLimitStorage(max_keys=2)
+    limit = _parse_limit("10/minute")
+    
+    storage.is_allowed("a", limit)
+    storage.is_allowed("b", limit)
+    storage.is_allowed("a", limit)
+    storage.is_allowed("c", limit)
+    
+    assert list(storage.buckets) == ["a", "c"]
+
+
+def test_evicts_idle_keys(clock):
+    storage = RateLimitStorage(idle_seconds=60)
+    limit = _parse_limit("10/minute")
+    
+    storage.is_allowed("a", limit)
+    clock.advance(30)
+    storage.is_allowed("b", limit)
+    clock.advance(31)
+    storage.is_allowed("c", limit)
+    
+    assert list(storage.buckets) == ["b", "c"]
+    assert len(storage) == 2
+
+
+def test_sharded_storage_admits_exactly_max_requests_across_threads(clock):
+    storage = ShardedRateLimitStorage(shard_count=4)
+    limits = (_parse_limit("100/day"),)
+    admitted = []
+    
+    def worker(n: int):
+        for i in range(50):
+            allowed, _ = run(storage.check_and_consume([f"client-{n}-{i}", "user"], limits))
+            if allowed:
+                admitted.append(1)
+    
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(admitted) == 100
@@ -0,0 +1,123 @@
+"""
+Redis rate limit storage tests
+
+Runs RedisRateLimitStorage.CHECK_SCRIPT on fakeredis (with lupa for Lua),
+whose TIME command follows the patched wall clock.
+"""
+
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from api.middleware import rate_limiting_middleware as rl
+from api.middleware.rate_limiting_middleware import RedisRateLimitStorage, _parse_limit
+
+if rl.redis is None:
+    pytest.skip("redis library not available", allow_module_level=True)
+
+
+class FakeWallClock:
+    """Wall clock (time.time, also Redis TIME) that only moves when told to"""
+    
+    def __init__(self):
+        self.wall = 1_700_000_000.0
+    
+    def time(self) -> float:
+        return self.wall
+    
+    def advance(self, seconds: float):
+        self.wall += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeWallClock()
+    monkeypatch.setattr(rl.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def run():
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(rl.redis, "from_url", lambda url: fakeredis.FakeAsyncRedis(server=server))
+    return RedisRateLimitStorage("redis://localhost:6379/0")
+
+
+def test_full_bucket_allows_max_requests_then_denies(clock, run, storage):
+    limits = (_parse_limit("3/minute"),)
+    
+    for _ in range(3):
+        assert run(storage.check_and_consume(["client"], limits))[0]
+    
+    allowed, info = run(storage.check_and_consume(["client"], limits))
+    assert not allowed
+    assert info["limit"] == "3/minute"
+    assert info["current"] == 3
+    assert info["reset_time"] == pytest.approx(clock.wall + 60)
+
+
+def test_allowed_info_reports_the_lowest_max_limit(clock, run, storage):
+    limits = (_parse_limit("100/hour"), _parse_limit("2/minute"))
+    
+    allowed, info = run(storage.check_and_consume(["client", "user"], limits))
+    assert allowed
+    assert info["limit"] == "2/minute"
+    assert info["max"] == 2
+    # Tokens before this request
+    assert info["current"] == 0
+
+
+def test_denied_bucket_on_second_key_maps_back_to_its_limit(clock, run, storage):
+    limits = (_parse_limit("100/hour"), _parse_limit("2/minute"))
+    
+    for _ in range(2):
+        assert run(storage.check_and_consume(["user"], limits))[0]
+    
+    # KEYS are client:100/hour, client:2/minute, user:100/hour, user:2/minute;
+    # the fourth fails
+    allowed, info = run(storage.check_and_consume(["client", "user"], limits))
+    assert not allowed
+    assert info["limit"] == "2/minute"
+    assert info["current"] == 2
+
+
+def test_denied_request_spends_no_tokens(clock, run, storage):
+    limits = (_parse_limit("2/minute"),)
+    
+    for _ in range(2):
+        assert run(storage.check_and_consume(["user"], limits))[0]
+    assert not run(storage.check_and_consume(["client", "user"], limits))[0]
+    
+    # The client bucket was never written, so it still allows two requests
+    assert run(storage.client.hget("ratelimit:client:2/minute", "tok")) is None
+    for _ in range(2):
+        assert run(storage.check_and_consume(["client"], limits))[0]
+    assert not run(storage.check_and_consume(["client"], limits))[0]
+
+
+def test_partial_refill_in_milliseconds(clock, run, storage):
+    limits = (_parse_limit("2/second"),)
+    
+    for _ in range(2):
+        assert run(storage.check_and_consume(["client"], limits))[0]
+    
+    # 250ms refill half a token: still denied, with a fractional token count
+    clock.advance(0.25)
+    allowed, info = run(storage.check_and_consume(["client"], limits))
+    assert not allowed
+    assert info["current"] == 2
+    assert info["reset_time"] == pytest.approx(clock.wall + 0.75)
+    
+    clock.advance(0.25)
+    assert run(storage.check_and_consume(["client"], limits))[0]
+    assert not run(storage.check_and_consume(["client"], limits))[0]
@@ -3,16 +3,18 @@
 Vercel-optimized FastAPI Main Application
 Lightweight version without heavy ML dependencies
 """
+import asyncio
 import os
 from contextlib import asynccontextmanager
 
 import uvicorn
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 
+from api.config.logging import get_api_logger
 from api.config.settings import settings
+from api.middleware.body_size_middleware import LargeBodyMiddleware
 from api.services.database import create_tables
 
 # Import only essential routers for Vercel
@@ -32,59 +34,33 @@ from api.routers.business.credits import router as credits_router
 # Import services for initialization
 from api.services.utils.vercel_compatibility import check_ml_availability
 
-
-class LargeBodyMiddleware(BaseHTTPMiddleware):
-    """Middleware to handle large request bodies"""
-
-    def __init__(self, app, max_body_size: int = 10 * 1024 * 1024):  # 10MB for Vercel
-        super().__init__(app)
-        self.max_body_size = max_body_size
-
-    async def dispatch(self, request: Request, call_next):
-        # Check content length if available
-        content_length = request.headers.get("content-length")
-        if content_length and int(content_length) > self.max_body_size:
-            return JSONResponse(status_code=413, content={"error": "Payload Too Large", "max_size": self.max_body_size})
-
-        # Read the body to prevent uvicorn's default 1MB limit
-        try:
-            body = await request.body()
-            if len(body) > self.max_body_size:
-                return JSONResponse(
-                    status_code=413, content={"error": "Payload Too Large", "max_size": self.max_body_size}
-                )
-            # Store the body for later use
-            request._body = body
-        except Exception as e:
-            return JSONResponse(status_code=413, content={"error": "Failed to read request body", "detail": str(e)})
-
-        response = await call_next(request)
-        return response
+logger = get_api_logger("vercel_main")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     # Startup
-    print("🚀 Starting clipizy API (Vercel optimized)...")
+    logger.info("🚀 Starting clipizy API (Vercel optimized)...")
 
     # Check ML availability
     ml_status = check_ml_availability()
-    print(f"📊 ML Libraries Status: {ml_status}")
+    logger.info("📊 ML Libraries Status: %s", ml_status)
 
-    # Create database tables
-    try:
-        from api.services.database import create_tables
+    # Create database tables (development only; other environments rely on migrations)
+    if os.getenv("ENVIRONMENT", "development") == "development":
+        try:
+            from api.services.database import create_tables
 
-        create_tables()
-        print("✅ Database tables created/verified")
-    except Exception as e:
-        print(f"⚠️ Database table creation failed: {e}")
+            await asyncio.to_thread(create_tables)
+            logger.info("✅ Database tables created/verified")
+        except Exception:
+            logger.exception("⚠️ Database table creation failed")
 
     yield
 
     # Shutdown
-    print("🛑 Shutting down clipizy API...")
+    logger.info("🛑 Shutting down clipizy API...")
 
 
 # Create FastAPI app
@@ -92,6 +68,7 @@ app = FastAPI(
     title="clipizy API (Vercel)",
     description="AI-powered music video generation platform - Vercel optimized",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan,
 )
 